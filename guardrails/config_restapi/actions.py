@@ -6,15 +6,13 @@ from nemoguardrails.actions.llm.utils import llm_call
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
-from src.services.application.rag import rag_service
-
-
-generator_service = rag_service.rest_generator_service
+from src.services.application.rag import get_rag_service
 
 
 async def get_query_response(user_question, session_id, user_id):
-    history = rag_service._get_session_history(session_id)
-    print("length of history is ", len(history))
+    rag_service = get_rag_service()
+    generator_service = rag_service.rest_generator_service
+    history = await rag_service._get_session_history(session_id)
     return await generator_service.generate_rest_api(
         user_question,
         history.copy(),  # Xài copy để tránh không edit vào chat_history gốc, để mỗi req đến ta chỉ lưu response cuối cùng
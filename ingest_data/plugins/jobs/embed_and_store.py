@@ -5,6 +5,7 @@ from langchain.schema import Document
 from langchain_chroma import Chroma
 from uuid import uuid4
 from plugins.jobs.utils import Minio_Loader
+from plugins.jobs.lexical_index import bm25_index_path, build_lexical_index
 from plugins.config.minio_config import (
     MINIO_ENDPOINT,
     MINIO_ACCESS_KEY,
@@ -54,6 +55,15 @@ class EmbedAndStore:
         print(f"Adding {len(splits)} document chunks to vector store…")
         vectordb.add_documents(documents=splits, ids=uuids)
 
+        # 4. Rebuild BM25 index trên toàn bộ collection (cùng chunk id) cho hybrid retrieval
+        data = vectordb._collection.get(include=["documents"])
+        index_path = build_lexical_index(
+            data["ids"],
+            data["documents"],
+            bm25_index_path(persist_directory, collection_name),
+        )
+        print(f"BM25 index for {len(data['ids'])} chunks written to {index_path}")
+
         return vectordb
 
 
@@ -0,0 +1,62 @@
+"""
+Build BM25 inverted index cho hybrid retrieval của serving app.
+
+Định dạng file và tokenizer phải giữ đồng bộ với
+src/infrastructure/vector_stores/bm25_index.py (ingest_data là package riêng,
+không import được code của app).
+"""
+
+import gzip
+import json
+import os
+import re
+import unicodedata
+from collections import Counter
+
+_TOKEN_RE = re.compile(r"\w+(?:[-./]\w+)*", flags=re.UNICODE)
+_SPLIT_RE = re.compile(r"[-./]")
+
+
+def tokenize(text: str) -> list[str]:
+    text = unicodedata.normalize("NFC", text).lower()
+    tokens = []
+    for match in _TOKEN_RE.findall(text):
+        tokens.append(match)
+        if _SPLIT_RE.search(match):
+            tokens.extend(part for part in _SPLIT_RE.split(match) if part)
+    return tokens
+
+
+def bm25_index_path(persist_directory: str, collection_name: str) -> str:
+    return os.path.join(persist_directory, "bm25", f"{collection_name}.json.gz")
+
+
+def build_lexical_index(ids: list[str], texts: list[str], path: str) -> str:
+    """
+    Build BM25 postings cho các chunk (cùng chunk id với Chroma) và ghi ra `path`.
+
+    Args:
+        ids (list[str]): Chunk ids, cùng thứ tự với texts.
+        texts (list[str]): Nội dung các chunk.
+        path (str): File .json.gz đích.
+
+    Returns:
+        str: Đường dẫn file index.
+    """
+    postings: dict[str, list[list[int]]] = {}
+    doc_lens = []
+    for doc_idx, text in enumerate(texts):
+        counts = Counter(tokenize(text))
+        doc_lens.append(sum(counts.values()))
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append([doc_idx, tf])
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(
+            {"ids": list(ids), "doc_lens": doc_lens, "postings": postings},
+            f,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+    return path
@@ -1,10 +1,21 @@
-from fastapi import Request
+from fastapi import HTTPException, Request, status
 from nemoguardrails import LLMRails
 
 
+def _get_rails(request: Request, name: str) -> LLMRails:
+    rails = getattr(request.app.state, name, None)
+    if rails is None:
+        # Guardrails được build trong warm-up, chưa sẵn sàng thì báo 503
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Service is warming up",
+        )
+    return rails
+
+
 def get_guardrails_restapi(request: Request) -> LLMRails:
-    return request.app.state.rails_restapi
+    return _get_rails(request, "rails_restapi")
 
 
 def get_guardrails_sse(request: Request) -> LLMRails:
-    return request.app.state.rails_sse
+    return _get_rails(request, "rails_sse")
@@ -0,0 +1,53 @@
+import hashlib
+import unicodedata
+from typing import Any
+
+import numpy as np
+
+from src.cache.lru import LRUCache
+from src.config.settings import SETTINGS
+
+
+class EmbeddingCache:
+    """
+    Cache embedding dùng chung trong process.
+
+    Key là hash của (model name, text đã chuẩn hoá) nên cùng một câu hỏi chỉ
+    được embed một lần cho dù được gọi từ semantic cache hay từ vector store.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = SETTINGS.EMBEDDING_CACHE_MAX_SIZE,
+        ttl: float | None = SETTINGS.EMBEDDING_CACHE_TTL,
+    ):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Chuẩn hoá unicode và khoảng trắng để các biến thể nhỏ dùng chung key"""
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def make_key(self, text: str, model_name: str) -> str:
+        payload = f"{model_name}\x00{self.normalize(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def get(self, text: str, model_name: str) -> np.ndarray | None:
+        return self._cache.get(self.make_key(text, model_name))
+
+    def set(self, text: str, model_name: str, vector: np.ndarray):
+        # Copy riêng: vector thường là một hàng (view) của ma trận batch, giữ view
+        # sẽ giữ luôn cả buffer (batch, dim) trong cache
+        vector = np.array(vector, dtype=np.float32, copy=True)
+        # Vector được chia sẻ giữa nhiều caller nên không cho phép sửa in-place
+        vector.setflags(write=False)
+        self._cache.set(self.make_key(text, model_name), vector)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return self._cache.stats()
+
+
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,180 @@
+"""
+Circuit breaker dùng chung cho mọi cache trên Redis.
+
+Mỗi thao tác Redis đi qua `redis_health.run(...)` với timeout chặt. Sau
+`failure_threshold` lỗi kết nối/timeout liên tiếp, breaker mở: các cache bỏ qua
+Redis ngay lập tức (coi như miss) thay vì mỗi request chờ hết socket timeout.
+Trong lúc mở, một task nền ping Redis mỗi `probe_interval` giây và đóng breaker
+khi Redis trả lời lại. Client sync (không có event loop) thì thử lại một
+request sau mỗi probe interval (half-open).
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+import redis.asyncio as aioredis
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+from src.config.settings import SETTINGS
+
+logger = logging.getLogger(__name__)
+
+# Chỉ lỗi kết nối/timeout mới tính là Redis "down"; lỗi lệnh (ResponseError, ...) thì không
+_UNAVAILABLE_ERRORS = (
+    asyncio.TimeoutError,
+    RedisConnectionError,
+    RedisTimeoutError,
+    OSError,
+)
+
+
+class RedisUnavailableError(Exception):
+    """Redis lỗi/timeout hoặc breaker đang mở; caller nên coi như cache miss"""
+
+
+class RedisHealth:
+    def __init__(
+        self,
+        redis_url: str = f"redis://{SETTINGS.REDIS_URI}",
+        op_timeout_ms: float = SETTINGS.REDIS_OP_TIMEOUT_MS,
+        write_timeout_ms: float = SETTINGS.REDIS_WRITE_TIMEOUT_MS,
+        failure_threshold: int = SETTINGS.REDIS_BREAKER_FAILURE_THRESHOLD,
+        probe_interval: float = SETTINGS.REDIS_BREAKER_PROBE_INTERVAL_S,
+    ):
+        self.redis_url = redis_url
+        self.op_timeout = op_timeout_ms / 1000
+        self.write_timeout = write_timeout_ms / 1000
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._last_trial = 0.0
+        self._lock = threading.Lock()
+        self._probe_task: Optional[asyncio.Task] = None
+        self._probe_client: Optional[aioredis.Redis] = None
+        self._stats = {"failures": 0, "opened": 0, "bypassed": 0, "probes": 0}
+
+    def client_kwargs(self) -> dict[str, Any]:
+        """Timeout cho connection pool của các cache (read tight hơn qua `run`)"""
+        return {
+            "socket_connect_timeout": self.op_timeout,
+            "socket_timeout": self.write_timeout,
+        }
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        """False nếu breaker đang mở (caller bỏ qua Redis ngay)"""
+        if self._opened_at is None:
+            return True
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Client sync: half-open, cho một request thử sau mỗi probe interval
+            with self._lock:
+                now = time.monotonic()
+                if now - self._last_trial >= self.probe_interval:
+                    self._last_trial = now
+                    return True
+        else:
+            self._ensure_probe()
+        self._stats["bypassed"] += 1
+        return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if self._opened_at is None:
+                return
+            down_for = time.monotonic() - self._opened_at
+            self._opened_at = None
+        logger.info("Redis recovered after %.1fs, circuit closed", down_for)
+
+    def record_failure(self, error: BaseException):
+        with self._lock:
+            self._failures += 1
+            self._stats["failures"] += 1
+            if self._opened_at is not None or self._failures < self.failure_threshold:
+                return
+            self._opened_at = time.monotonic()
+            self._last_trial = self._opened_at
+            self._stats["opened"] += 1
+        # Chỉ log một lần khi mở, không log mỗi request
+        logger.warning(
+            "Redis unavailable after %s failures (%s), circuit opened",
+            self._failures,
+            error,
+        )
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._ensure_probe()
+
+    def _ensure_probe(self):
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = asyncio.create_task(self._probe())
+
+    async def _probe(self):
+        if self._probe_client is None:
+            self._probe_client = aioredis.Redis.from_url(
+                self.redis_url, max_connections=1, **self.client_kwargs()
+            )
+        while self._opened_at is not None:
+            await asyncio.sleep(self.probe_interval)
+            self._stats["probes"] += 1
+            try:
+                await asyncio.wait_for(
+                    self._probe_client.ping(), timeout=self.op_timeout
+                )
+            except Exception:
+                continue
+            self.record_success()
+
+    async def run(self, awaitable: Awaitable, timeout: Optional[float] = None) -> Any:
+        """
+        Chạy một thao tác Redis với timeout (mặc định op_timeout).
+
+        Raises:
+            RedisUnavailableError: breaker đang mở, hoặc lỗi kết nối/timeout.
+        """
+        if not self.allow():
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise RedisUnavailableError("circuit open")
+        try:
+            result = await asyncio.wait_for(awaitable, timeout or self.op_timeout)
+        except _UNAVAILABLE_ERRORS as e:
+            self.record_failure(e)
+            raise RedisUnavailableError(str(e) or type(e).__name__) from e
+        self.record_success()
+        return result
+
+    def run_sync(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Giống `run` cho client sync (timeout do socket_timeout của pool)"""
+        if not self.allow():
+            raise RedisUnavailableError("circuit open")
+        try:
+            result = fn(*args, **kwargs)
+        except _UNAVAILABLE_ERRORS as e:
+            self.record_failure(e)
+            raise RedisUnavailableError(str(e) or type(e).__name__) from e
+        self.record_success()
+        return result
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "state": "open" if self.is_open else "closed",
+            "consecutive_failures": self._failures,
+            **self._stats,
+        }
+
+
+redis_health = RedisHealth()
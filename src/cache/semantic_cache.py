@@ -1,56 +1,549 @@
 """
-    A semantic cache for LLM responses that supports both REST API and SSE.
+A semantic cache for LLM responses that supports both REST API and SSE.
 
-    This class provides a decorator-based caching mechanism that intelligently handles
-    two types of function returns:
-    1.  **Async Functions (for REST API):** Caches the final, complete string response.
-    2.  **Async Generator Functions (for SSE):** Caches both the individual streamed chunks and the full concatenated response.
+This class provides a decorator-based caching mechanism that intelligently handles
+two types of function returns:
+1.  **Async Functions (for REST API):** Caches the final, complete string response.
+2.  **Async Generator Functions (for SSE):** Caches both the individual streamed chunks and the full concatenated response.
 
-    The caching strategy is designed for interoperability. When a cache lookup occurs:
-    - A REST API call can retrieve a full response that was originally cached from an SSE stream by using the stored `full_response`.
-    - An SSE stream can retrieve a response cached by a REST API call and stream it back character-by-character to the client, preserving the streaming experience.
+The caching strategy is designed for interoperability. When a cache lookup occurs:
+- A REST API call can retrieve a full response that was originally cached from an SSE stream by using the stored `full_response`.
+- An SSE stream can retrieve a response cached by a REST API call and stream it back character-by-character to the client, preserving the streaming experience.
 
-    This prevents compatibility issues where one service type tries to use a cache entry from another, such as a REST API endpoint encountering an array of chunks from an SSE cache.
+This prevents compatibility issues where one service type tries to use a cache entry from another, such as a REST API endpoint encountering an array of chunks from an SSE cache.
 """
 
 import inspect
 import asyncio
+import hashlib
 import logging
+import re
 from functools import wraps
-from typing import List, Any, Optional
-from langchain_redis import RedisSemanticCache
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+import redis.asyncio as aioredis
+from redis.commands.search.field import TagField, VectorField
+from redis.commands.search.indexDefinition import IndexDefinition, IndexType
+from redis.exceptions import ResponseError
+from src.cache.lru import LRUCache
+from src.cache.redis_health import RedisUnavailableError, redis_health
+from src.cache.single_flight import SingleFlight, make_key
+from src.cache.storage import NamespaceBudget, PayloadCodec, PayloadDecodeError
+from src.config.settings import SETTINGS
 from src.infrastructure.embeddings.embeddings import embedding_service
 from src.utils.text_processing import build_context
-from langchain_core.outputs import Generation
+import numpy as np
 import json
 
 logger = logging.getLogger(__name__)
 
+_TAG_ESCAPE_RE = re.compile(r"([^\w])")
+# Tách response không có chunk boundary (vd: entry từ REST), giữ nguyên khoảng trắng/xuống dòng
+_REPLAY_SPLIT_RE = re.compile(r"\S+\s*|\s+")
+
+
+def _is_missing_index(error: ResponseError) -> bool:
+    """Index bị mất (Redis restart không có persistence, FLUSHALL, ...)"""
+    message = str(error).lower()
+    return "no such index" in message or "unknown index name" in message
+
+
+def _escape_tag(value: str) -> str:
+    """Escape ký tự đặc biệt trong TAG query của RediSearch (vd: '-' trong 'pre-cache')"""
+    return _TAG_ESCAPE_RE.sub(r"\\\1", value)
+
+
+def _replay_pieces(cached_data: dict) -> List[str]:
+    """Dựng lại các chunk gốc từ `response` + `chunk_lens` của entry SSE"""
+    response = cached_data["response"]
+    chunk_lens = cached_data.get("chunk_lens")
+    if not chunk_lens or sum(chunk_lens) != len(response):
+        return _REPLAY_SPLIT_RE.findall(response)
+
+    pieces, offset = [], 0
+    for length in chunk_lens:
+        pieces.append(response[offset : offset + length])
+        offset += length
+    return pieces
+
+
+def _coalesce(
+    pieces: Iterable[str],
+    max_bytes: int = SETTINGS.SSE_REPLAY_FRAME_BYTES,
+    max_chunks: int = SETTINGS.SSE_REPLAY_FRAME_CHUNKS,
+) -> Iterator[str]:
+    """Gộp các chunk liên tiếp thành frame tới khi đủ max_bytes hoặc max_chunks"""
+    buffer: List[str] = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece.encode("utf-8"))
+        if size >= max_bytes or len(buffer) >= max_chunks:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
 
 class SemanticCacheLLMs:
     def __init__(
         self,
-        redis_url: str = "redis://localhost:6378",
+        redis_url: str = f"redis://{SETTINGS.REDIS_URI}",
         *,
         embeddings: Optional[Any] = None,
-        distance_threshold: float = 0.2,
-        ttl: int = 20,
+        distance_threshold: float = SETTINGS.SEMANTIC_CACHE_DISTANCE_THRESHOLD,
+        ttl: int = SETTINGS.SEMANTIC_CACHE_TTL,
+        index_name: str = "llmcache",
+        vector_dtype: str = SETTINGS.SEMANTIC_CACHE_VECTOR_DTYPE,
+        max_connections: int = SETTINGS.REDIS_MAX_CONNECTIONS,
+        write_queue_size: int = SETTINGS.SEMANTIC_CACHE_WRITE_QUEUE_SIZE,
+        write_batch_size: int = SETTINGS.SEMANTIC_CACHE_WRITE_BATCH_SIZE,
+        l1_max_size: int = SETTINGS.SEMANTIC_CACHE_L1_MAX_SIZE,
     ):
-        self._cache = RedisSemanticCache(
-            embeddings=embeddings or embedding_service,
-            redis_url=redis_url,
-            distance_threshold=distance_threshold,
-            ttl=ttl,
-            name="llm_cache",
-            prefix="llmcache",
+        self.redis_url = redis_url
+        self.embeddings = embeddings or embedding_service
+        self.distance_threshold = distance_threshold
+        self.ttl = ttl
+        self.index_name = index_name
+        self.prefix = f"{index_name}:"
+        # Entry exact-match (string) để riêng prefix, không nằm trong vector index
+        self.exact_prefix = f"{index_name}-exact:"
+        # Pool async dùng chung cho mọi request, connection được mở lazy
+        self.pool = aioredis.ConnectionPool.from_url(
+            redis_url, max_connections=max_connections, **redis_health.client_kwargs()
         )
+        self.redis = aioredis.Redis(connection_pool=self.pool)
+
+        # Vector float16 tốn một nửa bộ nhớ; đổi dtype cần drop index cũ vì TYPE khác
+        if vector_dtype not in ("float32", "float16"):
+            raise ValueError(f"Unknown vector dtype: {vector_dtype}")
+        self.vector_dtype = np.dtype(vector_dtype)
+        self.codec = PayloadCodec()
+        # Giới hạn entry/byte cho mỗi namespace, evict LRU/LFU
+        self.budget = NamespaceBudget(self.redis, prefix=f"{index_name}-meta:")
+        self._background: set = set()
+
+        # Index cần biết dimension của vector nên chỉ tạo ở lần dùng đầu tiên (hoặc khi warmup)
+        self._index_ready = False
+        self._index_lock = asyncio.Lock()
+
+        # Write-behind: update cache chạy ở worker nền, không nằm trên response path.
+        # Queue được tạo lazy trong event loop đang chạy
+        self.write_queue_size = write_queue_size
+        self.write_batch_size = write_batch_size
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._write_stats = {
+            "enqueued": 0,
+            "written": 0,
+            "dropped": 0,
+            "failed": 0,
+            "bypassed": 0,
+        }
+        # Gộp các miss trùng key đang chạy đồng thời thành một lần gọi pipeline
+        self.single_flight = SingleFlight()
+
+        # L1: exact-match in-process theo text đã chuẩn hoá, TTL giống entry trên Redis.
+        # Hit ở L1 không cần embed và không gọi Redis
+        self.l1 = LRUCache(maxsize=l1_max_size, ttl=ttl)
+        self._semantic_stats = {"hits": 0, "misses": 0}
+        self._exact_stats = {"hits": 0, "misses": 0}
         logger.info(
             "SemanticCacheLLMs init (threshold=%s, ttl=%s)",
             distance_threshold,
             ttl,
         )
 
-    def cache(self, *, namespace: str):
+    async def _ensure_index(self, dim: int):
+        if self._index_ready:
+            return
+        async with self._index_lock:
+            if self._index_ready:
+                return
+            index = self.redis.ft(self.index_name)
+            try:
+                await index.info()
+            except ResponseError:
+                await index.create_index(
+                    [
+                        TagField("namespace"),
+                        VectorField(
+                            "vector",
+                            "FLAT",
+                            {
+                                "TYPE": self.vector_dtype.name.upper(),
+                                "DIM": dim,
+                                "DISTANCE_METRIC": "COSINE",
+                            },
+                        ),
+                    ],
+                    definition=IndexDefinition(
+                        prefix=[self.prefix], index_type=IndexType.HASH
+                    ),
+                )
+                logger.info(
+                    "Created semantic cache index %s (dim=%s)", self.index_name, dim
+                )
+            self._index_ready = True
+
+    async def warmup(self):
+        """Kiểm tra kết nối Redis và tạo index trước khi nhận traffic"""
+        vector = await self.embeddings.aembed_query_np("warmup")
+        try:
+            await redis_health.run(self.redis.ping())
+            await redis_health.run(
+                self._ensure_index(vector.shape[0]), timeout=redis_health.write_timeout
+            )
+        except RedisUnavailableError as e:
+            # Redis down không chặn startup, cache chỉ bị bypass tới khi breaker đóng
+            logger.warning(
+                "Redis unavailable at warm-up, semantic cache bypassed: %s", e
+            )
+
+    def _key(self, prompt: str, namespace: str) -> str:
+        # Key cố định theo (namespace, prompt): miss lặp lại ghi đè thay vì tạo entry trùng
+        digest = hashlib.sha256(f"{namespace}\x00{prompt}".encode("utf-8")).hexdigest()
+        return f"{self.prefix}{digest}"
+
+    def _exact_key(self, namespace: str, exact_key: str) -> str:
+        return f"{self.exact_prefix}{namespace}:{exact_key}"
+
+    async def _get(
+        self, namespace: str, prompt: str, exact_key: Optional[str] = None
+    ) -> Tuple[Optional[dict], Optional[np.ndarray]]:
+        """
+        Tra L1 rồi tới Redis: GET theo `exact_key` nếu có, ngược lại semantic KNN.
+
+        Returns:
+            (cache_data hoặc None, vector của prompt; None nếu hit ở L1 hoặc exact)
+        """
+        l1_key = make_key(namespace, exact_key or prompt)
+        cached_data = self.l1.get(l1_key)
+        if cached_data is not None:
+            return cached_data, None
+
+        # Breaker mở: bỏ qua Redis (và embedding) ngay, coi như miss
+        if not redis_health.allow():
+            return None, None
+
+        if exact_key is not None:
+            key = self._exact_key(namespace, exact_key)
+            try:
+                raw = await redis_health.run(self.redis.get(key))
+            except RedisUnavailableError:
+                return None, None
+            except ResponseError as e:
+                logger.warning("Semantic cache GET failed, treating as miss: %s", e)
+                return None, None
+            if raw is not None:
+                try:
+                    cached_data = self.codec.decode(raw)
+                except PayloadDecodeError as e:
+                    logger.warning("Corrupt semantic cache entry %s: %s", key, e)
+                    raw = None
+            if raw is None:
+                self._exact_stats["misses"] += 1
+                return None, None
+            self._exact_stats["hits"] += 1
+            self.l1.set(l1_key, cached_data)
+            self._spawn(self.budget.touch(namespace, key))
+            return cached_data, None
+
+        # Embed off-loop một lần, dùng lại vector khi update
+        vector = await self.embeddings.aembed_query_np(prompt)
+        try:
+            key, cached_data = await redis_health.run(self._lookup(namespace, vector))
+        except RedisUnavailableError:
+            return None, vector
+        except ResponseError as e:
+            logger.warning("Semantic cache lookup failed, treating as miss: %s", e)
+            return None, vector
+        if cached_data is None:
+            self._semantic_stats["misses"] += 1
+        else:
+            self._semantic_stats["hits"] += 1
+            self.l1.set(l1_key, cached_data)
+            self._spawn(self.budget.touch(namespace, key))
+        return cached_data, vector
+
+    async def contains(self, namespace: str, prompt: str) -> bool:
+        """
+        Kiểm tra prompt đã có entry trên Redis chưa (bỏ qua L1, không tính vào
+        hit/miss stats). Dùng cho cache warmer.
+        """
+        vector = await self.embeddings.aembed_query_np(prompt)
+        try:
+            _, cached_data = await redis_health.run(
+                self._lookup(namespace, vector), timeout=redis_health.write_timeout
+            )
+        except ResponseError as e:
+            logger.warning("Semantic cache lookup failed, treating as miss: %s", e)
+            return False
+        return cached_data is not None
+
+    async def _lookup(
+        self, namespace: str, vector: np.ndarray
+    ) -> Tuple[Optional[bytes], Optional[dict]]:
+        """KNN top-1 trong đúng namespace, trả về (key, cache_data) nếu đủ gần"""
+        await self._ensure_index(vector.shape[0])
+        try:
+            result = await self._search(namespace, vector)
+        except ResponseError as e:
+            if not _is_missing_index(e):
+                raise
+            # Index mất sau khi Redis restart/flush: tạo lại ở lần dùng tiếp theo,
+            # FT.CREATE sẽ index lại các hash còn nằm dưới prefix
+            logger.warning(
+                "Semantic cache index %s missing, recreating", self.index_name
+            )
+            self._index_ready = False
+            return None, None
+        # [total, key, [field, value, ...], ...]
+        for i in range(1, len(result), 2):
+            key, values = result[i], result[i + 1]
+            fields = dict(zip(values[::2], values[1::2]))
+            if float(fields[b"distance"]) > self.distance_threshold:
+                continue
+            try:
+                return key, self.codec.decode(fields[b"response"])
+            except (KeyError, PayloadDecodeError) as e:
+                logger.warning("Corrupt semantic cache entry %s: %s", key, e)
+                return None, None
+        return None, None
+
+    async def _search(self, namespace: str, vector: np.ndarray) -> list:
+        # Gọi FT.SEARCH trực tiếp để nhận payload dạng bytes (payload đã nén)
+        return await self.redis.execute_command(
+            "FT.SEARCH",
+            self.index_name,
+            f"(@namespace:{{{_escape_tag(namespace)}}})"
+            "=>[KNN 1 @vector $vector AS distance]",
+            "RETURN",
+            2,
+            "response",
+            "distance",
+            "SORTBY",
+            "distance",
+            "LIMIT",
+            0,
+            1,
+            "PARAMS",
+            2,
+            "vector",
+            vector.astype(self.vector_dtype).tobytes(),
+            "DIALECT",
+            2,
+        )
+
+    def _spawn(self, coro):
+        """Chạy việc phụ (vd: cập nhật rank khi hit) ngoài response path"""
+        task = asyncio.create_task(redis_health.run(coro))
+        self._background.add(task)
+        task.add_done_callback(self._on_background_done)
+
+    def _on_background_done(self, task: asyncio.Task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug("Semantic cache background task failed: %s", task.exception())
+
+    async def _write_many(
+        self,
+        entries: List[Tuple[str, str, Optional[np.ndarray], dict, Optional[str]]],
+    ):
+        """Ghi một batch entry (SET EX hoặc HSET + EXPIRE) trong một pipeline"""
+        # Entry semantic chưa có vector thì embed chung một lần encode, ngoài event loop
+        missing = [
+            i
+            for i, entry in enumerate(entries)
+            if entry[2] is None and entry[4] is None
+        ]
+        if missing:
+            vectors = await asyncio.to_thread(
+                self.embeddings.embed_documents_np, [entries[i][0] for i in missing]
+            )
+            for i, vector in zip(missing, vectors):
+                prompt, namespace, _, cache_data, exact_key = entries[i]
+                entries[i] = (prompt, namespace, vector, cache_data, exact_key)
+
+        dims = [entry[2].shape[0] for entry in entries if entry[4] is None]
+        if dims:
+            await redis_health.run(
+                self._ensure_index(dims[0]), timeout=redis_health.write_timeout
+            )
+
+        writes = []
+        for prompt, namespace, vector, cache_data, exact_key in entries:
+            payload = self.codec.encode(cache_data)
+            if exact_key is not None:
+                key = self._exact_key(namespace, exact_key)
+                writes.append((namespace, key, payload, None, len(payload)))
+                continue
+            vector_bytes = vector.astype(self.vector_dtype).tobytes()
+            mapping = {
+                "prompt": prompt,
+                "response": payload,
+                "namespace": namespace,
+                "vector": vector_bytes,
+            }
+            nbytes = len(payload) + len(vector_bytes) + len(prompt.encode("utf-8"))
+            writes.append(
+                (namespace, self._key(prompt, namespace), None, mapping, nbytes)
+            )
+
+        await redis_health.run(
+            self._write_redis(writes), timeout=redis_health.write_timeout
+        )
+
+    async def _write_redis(
+        self, writes: List[Tuple[str, str, Optional[bytes], Optional[dict], int]]
+    ):
+        budget_entries = [(ns, key, nbytes) for ns, key, _, _, nbytes in writes]
+        old_sizes = await self.budget.old_sizes(budget_entries)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for _, key, payload, mapping, _ in writes:
+                if mapping is None:
+                    pipe.set(key, payload, ex=self.ttl)
+                else:
+                    pipe.hset(key, mapping=mapping)
+                    pipe.expire(key, self.ttl)
+            self.budget.record(pipe, budget_entries, old_sizes, self.ttl)
+            await pipe.execute()
+
+        await self.budget.enforce(ns for ns, _, _ in budget_entries)
+
+    def _update(
+        self,
+        prompt: str,
+        namespace: str,
+        vector: Optional[np.ndarray],
+        cache_data: dict,
+        exact_key: Optional[str] = None,
+    ):
+        """Đẩy entry vào write-behind queue; queue đầy thì bỏ entry (cache chỉ là tối ưu)"""
+        # L1 có ngay, không chờ write-behind
+        self.l1.set(make_key(namespace, exact_key or prompt), cache_data)
+
+        if redis_health.is_open:
+            self._write_stats["bypassed"] += 1
+            return
+
+        if self._write_queue is None:
+            self._write_queue = asyncio.Queue(maxsize=self.write_queue_size)
+        if self._writer_task is None or self._writer_task.done():
+            self._writer_task = asyncio.create_task(self._writer())
+
+        try:
+            self._write_queue.put_nowait(
+                (prompt, namespace, vector, cache_data, exact_key)
+            )
+            self._write_stats["enqueued"] += 1
+        except asyncio.QueueFull:
+            self._write_stats["dropped"] += 1
+            logger.warning("Semantic cache write queue full, dropped [%s]", namespace)
+
+    async def _writer(self):
+        """Worker nền: gom entry trong queue thành batch rồi ghi Redis"""
+        queue = self._write_queue
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.write_batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                await self._write_many(batch)
+                self._write_stats["written"] += len(batch)
+            except RedisUnavailableError as e:
+                self._write_stats["failed"] += len(batch)
+                logger.debug(
+                    "Semantic cache write skipped (%s entries): %s", len(batch), e
+                )
+            except Exception as e:
+                self._write_stats["failed"] += len(batch)
+                logger.error(
+                    "Semantic cache write failed (%s entries): %s", len(batch), e
+                )
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def drain(self, timeout: float = 5.0) -> bool:
+        """Chờ queue được ghi hết, worker và connection pool vẫn chạy tiếp"""
+        if self._write_queue is None or self._writer_task is None:
+            return True
+        try:
+            await asyncio.wait_for(self._write_queue.join(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Semantic cache drain timed out, %s entries not written yet",
+                self._write_queue.qsize(),
+            )
+            return False
+
+    async def flush(self, timeout: float = 5.0):
+        """Chờ queue được ghi hết (dùng khi shutdown), rồi dừng worker và đóng pool"""
+        await self.drain(timeout=timeout)
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+        await self.pool.disconnect()
+
+    async def storage_stats(self) -> dict[str, Any]:
+        """Dung lượng trên Redis theo namespace (entries, bytes, bytes/entry)"""
+        stats = {
+            "vector_dtype": self.vector_dtype.name,
+            "compression": self.codec.compression,
+            "ttl": self.ttl,
+        }
+        try:
+            stats.update(
+                await redis_health.run(
+                    self.budget.stats(), timeout=redis_health.write_timeout
+                )
+            )
+        except RedisUnavailableError:
+            stats["available"] = False
+        return stats
+
+    def stats(self) -> dict[str, Any]:
+        """Metrics của hai tier cache, write-behind queue và single-flight"""
+        semantic_lookups = sum(self._semantic_stats.values())
+        return {
+            "l1": self.l1.stats(),
+            "exact": dict(self._exact_stats),
+            "semantic": {
+                **self._semantic_stats,
+                "hit_rate": (
+                    self._semantic_stats["hits"] / semantic_lookups
+                    if semantic_lookups
+                    else 0.0
+                ),
+            },
+            "writes": {
+                **self._write_stats,
+                "queue_depth": self._write_queue.qsize() if self._write_queue else 0,
+                "queue_maxsize": self.write_queue_size,
+            },
+            "single_flight": self.single_flight.stats(),
+        }
+
+    def cache(
+        self,
+        *,
+        namespace: str,
+        key_builder: Optional[Callable[..., str]] = None,
+        stream_format: str = "sse",
+    ):
+        """
+        Decorator cache cho REST (coroutine) và SSE (async generator).
+
+        Mặc định key là text (question hoặc context) và tra bằng semantic KNN.
+        Nếu có `key_builder(*args, **kwargs) -> str` thì dùng exact key đó với
+        GET/SET trên Redis, không cần embed.
+
+        `stream_format` cho async generator: "sse" nếu function yield frame
+        `json.dumps(text) + "\\n\\n"`, "raw" nếu yield text thô (frame do tầng ngoài).
+        """
+        if stream_format not in ("sse", "raw"):
+            raise ValueError(f"Unknown stream format: {stream_format}")
+
         def inner(func):
             is_async_gen = inspect.isasyncgenfunction(func)
             is_async_func = asyncio.iscoroutinefunction(func) and not is_async_gen
@@ -62,64 +555,73 @@ class SemanticCacheLLMs:
                     question = kwargs.get("question")
                     messages = kwargs.get("messages")
 
-                    if messages:  # post-cache
+                    exact_key = key_builder(*args, **kwargs) if key_builder else None
+                    if exact_key is not None:  # exact key, không cần build context
+                        context_str = question
+                    elif messages:  # post-cache
                         context_str = build_context(messages)
                     else:  # pre-cache
                         context_str = question
 
-                    # 1) Lookup
-                    hits: List[Generation] = self._cache.lookup(context_str, namespace)
-                    if hits:
+                    # 1) Lookup (L1, rồi exact GET hoặc semantic KNN)
+                    cached_data, vector = await self._get(
+                        namespace, context_str, exact_key
+                    )
+                    if cached_data:
                         logger.info("SSE Cache-hit [%s]: %s", namespace, context_str)
-                        txt = hits[0].text
-                        print(txt)
 
                         try:
-                            cached_data = json.loads(txt)
-                            response_to_yield = cached_data.get("response", "")
-
-                            if response_to_yield and isinstance(response_to_yield, str):
-                                # Stream word by word for smooth UX
-                                words = response_to_yield.split(" ")
-                                for i, word in enumerate(words):
-                                    # Add space back except for last word
-                                    chunk = word + (" " if i < len(words) - 1 else "")
-                                    yield f"{json.dumps(chunk)}\n\n"
-
-                                return
-                        except (json.JSONDecodeError, KeyError):
+                            pieces = _replay_pieces(cached_data)
+                        except (KeyError, TypeError):
                             # Fallback for malformed cache
-                            yield f"{json.dumps('Error loading from cache')}\n\n"
-                            return
+                            pieces = ["Error loading from cache"]
 
-                    # 2) Call LLM function
-                    full_response = ""
-                    async for chunk in func(*args, **kwargs):
-                        clean_chunk = chunk.replace("\n\n", "")
-
-                        #  Try to decode JSON if it looks like JSON (starts and ends with quotes)
-                        if clean_chunk.strip().startswith(
-                            '"'
-                        ) and clean_chunk.strip().endswith('"'):
-                            # This is likely JSON-encoded text from RAG service
-                            decoded_chunk = json.loads(clean_chunk)
-                            full_response += decoded_chunk
-                        else:
-                            full_response += clean_chunk
+                        # Replay theo chunk gốc, gộp thành ít frame
+                        for text in _coalesce(pieces):
+                            yield (
+                                f"{json.dumps(text)}\n\n"
+                                if stream_format == "sse"
+                                else text
+                            )
+                        return
 
+                    # 2) Call LLM function
+                    async def generate():
+                        texts = []
+                        async for chunk in func(*args, **kwargs):
+                            text = chunk
+                            if stream_format == "sse":
+                                clean_chunk = chunk.replace("\n\n", "")
+
+                                #  Try to decode JSON if it looks like JSON (starts and ends with quotes)
+                                if clean_chunk.strip().startswith(
+                                    '"'
+                                ) and clean_chunk.strip().endswith('"'):
+                                    # This is likely JSON-encoded text from RAG service
+                                    text = json.loads(clean_chunk)
+                                else:
+                                    text = clean_chunk
+                            if text:
+                                texts.append(text)
+
+                            yield chunk
+
+                        # 3) Update cache: full response + độ dài từng chunk để replay đúng boundary
+                        cache_data = {
+                            "type": "sse_response",
+                            "response": "".join(texts),
+                            "chunk_lens": [len(text) for text in texts],
+                        }
+                        self._update(
+                            context_str, namespace, vector, cache_data, exact_key
+                        )
+                        logger.info("SSE Cache-miss [%s]: %s", namespace, context_str)
+
+                    # Request trùng key đang chạy thì subscribe vào stream live của leader
+                    async for chunk in self.single_flight.stream(
+                        make_key(namespace, exact_key or context_str), generate
+                    ):
                         yield chunk
-
-                    # 3) Update cache with clean full response
-                    cache_data = {
-                        "type": "sse_response",
-                        "response": full_response.strip(),
-                    }
-                    self._cache.update(
-                        context_str,
-                        namespace,
-                        [Generation(text=json.dumps(cache_data))],
-                    )
-                    logger.info("SSE Cache-miss [%s]: %s", namespace, context_str)
                     return
 
                 return wrapper
@@ -130,36 +632,45 @@ class SemanticCacheLLMs:
                     question = kwargs.get("question")
                     messages = kwargs.get("messages")
 
-                    if messages:  # post-cache
+                    exact_key = key_builder(*args, **kwargs) if key_builder else None
+                    if exact_key is not None:  # exact key, không cần build context
+                        context_str = question
+                    elif messages:  # post-cache
                         context_str = build_context(messages)
                     else:  # pre-cache
                         context_str = question
 
-                    # 1) Lookup
-                    hits: List[Generation] = self._cache.lookup(context_str, namespace)
-                    if hits:
+                    # 1) Lookup (L1, rồi exact GET hoặc semantic KNN)
+                    cached_data, vector = await self._get(
+                        namespace, context_str, exact_key
+                    )
+                    if cached_data:
                         logger.info("SSE Cache-hit [%s]: %s", namespace, context_str)
-                        txt = hits[0].text
-                        print(txt)
 
-                        cached_data = json.loads(txt)
                         response_content = cached_data["response"]
+                        if cached_data.get("type") == "sse_response":
+                            response_content = response_content.strip()
 
                         return response_content
 
                     # 2) Call LLM function
-                    result = await func(*args, **kwargs)
-
-                    # 3) Update cache
-                    cache_data = {"type": "rest_response", "response": result}
-                    self._cache.update(
-                        context_str,
-                        namespace,
-                        [Generation(text=json.dumps(cache_data))],
+                    async def generate():
+                        result = await func(*args, **kwargs)
+
+                        # 3) Update cache
+                        cache_data = {"type": "rest_response", "response": result}
+                        self._update(
+                            context_str, namespace, vector, cache_data, exact_key
+                        )
+                        logger.debug(
+                            "Cache-miss → stored [%s]: %s", namespace, context_str
+                        )
+                        return result
+
+                    # Request trùng key đang chạy thì chờ kết quả của leader
+                    return await self.single_flight.do(
+                        make_key(namespace, exact_key or context_str), generate
                     )
-                    logger.debug("Cache-miss → stored [%s]: %s", namespace, context_str)
-
-                    return result
 
                 return wrapper
 
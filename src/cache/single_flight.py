@@ -0,0 +1,141 @@
+"""
+Single-flight cho các cache miss giống nhau xảy ra đồng thời.
+
+Request đầu tiên (leader) chạy pipeline, các request trùng key (follower) chờ
+kết quả của leader thay vì gọi LLM thêm lần nữa:
+- REST: follower await cùng một Future.
+- SSE: pipeline chạy trong task riêng và publish từng chunk vào buffer;
+  leader và follower đều là subscriber, follower vào sau được replay phần đã
+  stream rồi nhận tiếp token live. Client của leader ngắt kết nối cũng không
+  làm hỏng stream của follower.
+"""
+
+import asyncio
+import hashlib
+import unicodedata
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+
+def make_key(namespace: str, text: str) -> str:
+    """Key theo namespace + text đã chuẩn hoá (unicode, khoảng trắng, hoa/thường)"""
+    normalized = " ".join(unicodedata.normalize("NFC", text).split()).casefold()
+    return hashlib.sha256(f"{namespace}\x00{normalized}".encode("utf-8")).hexdigest()
+
+
+class _Broadcast:
+    """Buffer chunk của một stream, cho nhiều subscriber đọc đồng thời"""
+
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.condition = asyncio.Condition()
+        self.task: Optional[asyncio.Task] = None
+
+    async def publish(self, chunk: Any):
+        async with self.condition:
+            self.chunks.append(chunk)
+            self.condition.notify_all()
+
+    async def close(self, error: Optional[BaseException] = None):
+        async with self.condition:
+            self.done = True
+            self.error = error
+            self.condition.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        position = 0
+        while True:
+            async with self.condition:
+                await self.condition.wait_for(
+                    lambda: len(self.chunks) > position or self.done
+                )
+                pending = self.chunks[position:]
+                done, error = self.done, self.error
+
+            for chunk in pending:
+                yield chunk
+            position += len(pending)
+
+            if done and position >= len(self.chunks):
+                if error is not None:
+                    raise error
+                return
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        self._streams: Dict[str, _Broadcast] = {}
+        self._stats = {"leaders": 0, "followers": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Chạy `fn` một lần cho mỗi key đang in-flight, follower nhận chung kết quả"""
+        while True:
+            future = self._calls.get(key)
+            if future is None:
+                break
+            self._stats["followers"] += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Leader bị huỷ (không phải follower): thử lại, có thể trở thành leader
+                if future.cancelled():
+                    continue
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        # Tránh warning "exception was never retrieved" khi không có follower
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._calls[key] = future
+        self._stats["leaders"] += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._calls.pop(key, None)
+
+    async def stream(
+        self, key: str, fn: Callable[[], AsyncIterator[Any]]
+    ) -> AsyncIterator[Any]:
+        """Stream của `fn()` được chia sẻ cho mọi request cùng key đang in-flight"""
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast()
+            self._streams[key] = broadcast
+            broadcast.task = asyncio.create_task(self._produce(key, broadcast, fn))
+            self._stats["leaders"] += 1
+        else:
+            self._stats["followers"] += 1
+
+        async for chunk in broadcast.subscribe():
+            yield chunk
+
+    async def _produce(
+        self, key: str, broadcast: _Broadcast, fn: Callable[[], AsyncIterator[Any]]
+    ):
+        try:
+            async for chunk in fn():
+                await broadcast.publish(chunk)
+        except BaseException as e:
+            await broadcast.close(e)
+            if not isinstance(e, Exception):
+                raise
+        else:
+            await broadcast.close()
+        finally:
+            self._streams.pop(key, None)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **self._stats,
+            "in_flight": len(self._calls) + len(self._streams),
+        }
@@ -1,15 +1,22 @@
 import json
+import hashlib
 import logging
 import asyncio
+import time
 from functools import wraps
-from typing import Any
+from typing import Any, Optional, Tuple
 from uuid import UUID
 
 import redis
+import redis.asyncio as aioredis
 from nemoguardrails import LLMRails
 
+from src.cache.redis_health import RedisUnavailableError, redis_health
 from src.config.settings import SETTINGS
 
+SOFT_EXPIRES_FIELD = "__soft_expires_at__"
+LOCK_SUFFIX = ":refresh-lock"
+
 
 class UUIDEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -19,15 +26,53 @@ class UUIDEncoder(json.JSONEncoder):
 
 
 class StandardCache:
-    def __init__(self):
-        self.storage_uri = f"redis://{SETTINGS.REDIS_URI}"
-        self.client = redis.Redis(
-            host=self.storage_uri.split(":")[1].replace("//", ""),
-            port=int(self.storage_uri.split(":")[2]),
+    def __init__(
+        self,
+        redis_url: str = f"redis://{SETTINGS.REDIS_URI}",
+        max_connections: int = SETTINGS.REDIS_MAX_CONNECTIONS,
+        refresh_lock_ms: int = SETTINGS.STANDARD_CACHE_REFRESH_LOCK_MS,
+    ):
+        self.storage_uri = redis_url
+        self.refresh_lock_ms = refresh_lock_ms
+        self._background: set = set()
+        # Key đang refresh trong process này, tránh spawn task trùng
+        self._refreshing: set = set()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "stale_served": 0,
+            "refreshes": 0,
+            "refresh_failed": 0,
+            "bypassed": 0,
+        }
+        # Pool async dùng chung cho mọi request, connection được mở lazy
+        self.pool = aioredis.ConnectionPool.from_url(
+            redis_url, max_connections=max_connections, **redis_health.client_kwargs()
         )
+        self.client = aioredis.Redis(connection_pool=self.pool)
+        # Client sync chỉ dùng cho function sync được decorate (chạy ngoài event loop)
+        self.sync_client = redis.Redis(
+            connection_pool=redis.ConnectionPool.from_url(
+                redis_url,
+                max_connections=max_connections,
+                **redis_health.client_kwargs(),
+            )
+        )
+
+    async def warmup(self):
+        """Kiểm tra kết nối Redis lúc khởi động"""
+        try:
+            await redis_health.run(self.client.ping())
+        except RedisUnavailableError as e:
+            logging.warning(
+                f"Redis unavailable at warm-up, standard cache bypassed: {e}"
+            )
 
-    def _cache_logic(self, func, args, kwargs, ttl, validatedModel, is_async=False):
-        """Shared cache logic cho cả sync và async functions"""
+    def _build_key(self, func, args, kwargs) -> str:
+        """
+        Key = prefix đọc được + sha256 của args/kwargs đã serialize:
+        `mlops:{env}:{module}:{func}:{digest}`, độ dài cố định dù question/history dài.
+        """
         environment = SETTINGS.ENVIRONMENT
         module_name = func.__module__
         func_name = func.__qualname__
@@ -50,57 +95,156 @@ class StandardCache:
         kwargs_to_serialize = {
             k: v for k, v in kwargs.items() if not isinstance(v, LLMRails)
         }
-        # Tạo cache key
         dumped_args = self.serialize(args_to_serialize)
         dumped_kwargs = self.serialize(kwargs_to_serialize)
-        key = (
-            f"mlops:{environment}:{module_name}:"
-            + f"{func_name}:{dumped_args}:{dumped_kwargs}"
-        )
-        logging.info(f"Cached key: {key}")
-
-        # Kiểm tra Redis connection
-        try:
-            cached_result = self.client.get(key)
-            logging.info(f"Cache lookup result: {cached_result is not None}")
-        except Exception as e:
-            logging.warning(f"Redis not available for key: {key}, error: {e}")
-            return None, None  # Signal: gọi function trực tiếp
-
+        digest = hashlib.sha256(
+            f"{dumped_args}\x00{dumped_kwargs}".encode("utf-8")
+        ).hexdigest()
+        return f"mlops:{environment}:{module_name}:{func_name}:{digest}"
+
+    def _lookup_result(
+        self, key: str, cached_result: Optional[bytes]
+    ) -> Tuple[str, str, Any]:
         # Cache HIT - trả về kết quả từ cache
         if cached_result:
+            data = self.deserialize(cached_result)
             logging.info(f"Cache HIT for key: {key}")
-            return "hit", self.deserialize(cached_result)
+            self._stats["hits"] += 1
+            return "hit", key, data
 
         # Cache MISS - cần gọi function
         logging.info(f"Cache MISS for key: {key}")
-        return "miss", key
+        self._stats["misses"] += 1
+        return "miss", key, None
+
+    async def _cache_logic(self, func, args, kwargs) -> Tuple[Optional[str], str, Any]:
+        """Lookup cho async functions, trả về (status, key, data); status None nếu Redis lỗi"""
+        key = self._build_key(func, args, kwargs)
+        try:
+            cached_result = await redis_health.run(self.client.get(key))
+            return self._lookup_result(key, cached_result)
+        except RedisUnavailableError:
+            # Breaker đã log khi mở, không log mỗi request
+            self._stats["bypassed"] += 1
+            return None, key, None  # Signal: gọi function trực tiếp
+        except Exception as e:
+            # Lỗi lệnh (vd: WRONGTYPE) hoặc entry hỏng: gọi function, không fail request
+            logging.warning(f"Cache lookup failed for key: {key}, error: {e}")
+            return None, key, None
+
+    def _sync_cache_logic(self, func, args, kwargs) -> Tuple[Optional[str], str, Any]:
+        """Giống _cache_logic nhưng dùng client sync"""
+        key = self._build_key(func, args, kwargs)
+        try:
+            cached_result = redis_health.run_sync(self.sync_client.get, key)
+            return self._lookup_result(key, cached_result)
+        except RedisUnavailableError:
+            self._stats["bypassed"] += 1
+            return None, key, None
+        except Exception as e:
+            logging.warning(f"Cache lookup failed for key: {key}, error: {e}")
+            return None, key, None
+
+    @staticmethod
+    def _unwrap(data: Any) -> Tuple[Any, bool]:
+        """Tách (value, is_stale) từ entry soft-TTL; entry thường coi như còn fresh"""
+        if isinstance(data, dict) and SOFT_EXPIRES_FIELD in data:
+            return data["value"], time.time() >= data[SOFT_EXPIRES_FIELD]
+        return data, False
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _refresh(self, key, func, args, kwargs, ttl, soft_ttl, validatedModel):
+        """
+        Tính lại entry đã stale ở background. Lock `SET NX PX` đảm bảo chỉ một
+        caller (trên mọi worker) refresh; lock tự hết hạn, không cần xoá, và
+        nếu refresh lỗi thì đóng vai trò backoff cho lần thử tiếp theo.
+        """
+        try:
+            acquired = await redis_health.run(
+                self.client.set(
+                    f"{key}{LOCK_SUFFIX}", 1, nx=True, px=self.refresh_lock_ms
+                )
+            )
+            if not acquired:
+                return
 
-    def cache(self, *, ttl: int = 60 * 60, validatedModel: Any = None):
+            result = await func(*args, **kwargs)
+            serialized_result = self._prepare_result(
+                key, result, validatedModel, soft_ttl
+            )
+            if serialized_result is not None:
+                await self.set_key(key, serialized_result, ttl)
+                self._stats["refreshes"] += 1
+        except Exception as e:
+            self._stats["refresh_failed"] += 1
+            logging.warning(f"Background refresh failed for key: {key}, error: {e}")
+        finally:
+            self._refreshing.discard(key)
+
+    def stats(self) -> dict[str, Any]:
+        return dict(self._stats)
+
+    def cache(
+        self,
+        *,
+        ttl: int = 60 * 60,
+        validatedModel: Any = None,
+        soft_ttl: Optional[int] = None,
+    ):
         """
         Decorator hỗ trợ cả sync và async functions
         - Tự động detect function type (sync/async)
         - Cache kết quả trong Redis với TTL
+        - `soft_ttl` (chỉ async): sau soft_ttl vẫn trả giá trị stale ngay lập tức
+          và refresh ở background (stale-while-revalidate); `ttl` vẫn là hard TTL
         """
+        if soft_ttl is not None and not 0 < soft_ttl < ttl:
+            raise ValueError("soft_ttl must be positive and smaller than ttl")
 
         def inner(func):
             is_async = asyncio.iscoroutinefunction(func)
+            if soft_ttl is not None and not is_async:
+                raise TypeError("soft_ttl is only supported for async functions")
 
             if is_async:
 
                 @wraps(func)
                 async def async_wrapper(*args, **kwargs):
-                    cache_result, data = self._cache_logic(
-                        func, args, kwargs, ttl, validatedModel, True
+                    cache_result, key, data = await self._cache_logic(
+                        func, args, kwargs
                     )
 
                     if cache_result is None:  # Redis lỗi
                         return await func(*args, **kwargs)
                     elif cache_result == "hit":  # Cache HIT
-                        return data
+                        value, is_stale = self._unwrap(data)
+                        if is_stale:
+                            self._stats["stale_served"] += 1
+                        if is_stale and key not in self._refreshing:
+                            self._refreshing.add(key)
+                            self._spawn(
+                                self._refresh(
+                                    key,
+                                    func,
+                                    args,
+                                    kwargs,
+                                    ttl,
+                                    soft_ttl,
+                                    validatedModel,
+                                )
+                            )
+                        return value
                     else:  # Cache MISS - gọi function và store kết quả
                         result = await func(*args, **kwargs)
-                        self._store_result(data, result, ttl, validatedModel)
+                        serialized_result = self._prepare_result(
+                            key, result, validatedModel, soft_ttl
+                        )
+                        if serialized_result is not None:
+                            await self.set_key(key, serialized_result, ttl)
                         return result
 
                 return async_wrapper
@@ -108,25 +252,29 @@ class StandardCache:
 
                 @wraps(func)
                 def sync_wrapper(*args, **kwargs):
-                    cache_result, data = self._cache_logic(
-                        func, args, kwargs, ttl, validatedModel, False
-                    )
+                    cache_result, key, data = self._sync_cache_logic(func, args, kwargs)
 
                     if cache_result is None:  # Redis lỗi
                         return func(*args, **kwargs)
                     elif cache_result == "hit":  # Cache HIT
-                        return data
+                        return self._unwrap(data)[0]
                     else:  # Cache MISS - gọi function và store kết quả
                         result = func(*args, **kwargs)
-                        self._store_result(data, result, ttl, validatedModel)
+                        serialized_result = self._prepare_result(
+                            key, result, validatedModel
+                        )
+                        if serialized_result is not None:
+                            self.set_key_sync(key, serialized_result, ttl)
                         return result
 
                 return sync_wrapper
 
         return inner
 
-    def _store_result(self, key, result, ttl, validatedModel):
-        """Lưu kết quả vào cache với validation (nếu có) --- Có 2 trường hợp lưu là 2 kết quả của Langchain và Guardrails"""
+    def _prepare_result(
+        self, key, result, validatedModel, soft_ttl: Optional[int] = None
+    ) -> Optional[str]:
+        """Serialize kết quả với validation (nếu có) --- Có 2 trường hợp lưu là 2 kết quả của Langchain và Guardrails"""
         data_to_serialize = None
         # Check if result is a Pydantic model
         if hasattr(result, "model_dump"):
@@ -142,7 +290,7 @@ class StandardCache:
             serialized_result = self.serialize(data_to_serialize)
         except TypeError as e:
             logging.warning(f"Could not serialize result for key: {key}, error: {e}")
-            return  # Do not cache if serialization fails
+            return None  # Do not cache if serialization fails
 
         # Validation (optional)
         if validatedModel:
@@ -150,20 +298,48 @@ class StandardCache:
                 validatedModel(**self.deserialize(serialized_result))
             except Exception as e:
                 logging.warning(f"Validation failed for key: {key}, error: {e}")
-                return  # Không cache nếu validation fail
+                return None  # Không cache nếu validation fail
+
+        if soft_ttl is not None:
+            # Envelope lưu mốc soft-expire cạnh value, hard TTL vẫn do Redis EX lo
+            serialized_result = self.serialize(
+                {
+                    SOFT_EXPIRES_FIELD: time.time() + soft_ttl,
+                    "value": data_to_serialize,
+                }
+            )
+        return serialized_result
 
-        # Store vào Redis
-        self.set_key(key, serialized_result, ttl)
-        logging.info(f"Cache STORED for key: {key}")
+    async def set_key(self, key: str, value: Any, ttl: int = 60 * 60):
+        """Sets key value pair in redis cache (một round trip SET EX, atomic)"""
+        try:
+            await redis_health.run(
+                self.client.set(key, value, ex=ttl), timeout=redis_health.write_timeout
+            )
+            logging.info(f"Cache STORED for key: {key}")
+        except RedisUnavailableError:
+            pass
+        except Exception as e:
+            logging.warning(f"Could not store key: {key}, error: {e}")
 
-    def set_key(self, key: str, value: Any, ttl: int = 60 * 60):
-        """Sets key value pair in redis cache"""
-        self.client.set(key, value)
-        self.client.expire(key, ttl)
+    def set_key_sync(self, key: str, value: Any, ttl: int = 60 * 60):
+        """Sync version của set_key"""
+        try:
+            redis_health.run_sync(self.sync_client.set, key, value, ex=ttl)
+            logging.info(f"Cache STORED for key: {key}")
+        except RedisUnavailableError:
+            pass
+        except Exception as e:
+            logging.warning(f"Could not store key: {key}, error: {e}")
 
-    def remove_key(self, key: str):
+    async def remove_key(self, key: str):
         """Removes key from redis cache"""
-        self.client.delete(key)
+        try:
+            await redis_health.run(
+                self.client.delete(key), timeout=redis_health.write_timeout
+            )
+        except RedisUnavailableError as e:
+            logging.warning(f"Could not remove key: {key}, error: {e}")
 
     def serialize(self, value: Any) -> str:
         """Serializes the value to json"""
@@ -173,9 +349,19 @@ class StandardCache:
         """Deserializes the value from json"""
         return json.loads(value)
 
-    def list_keys(self, pattern: str = f"mlops:{SETTINGS.ENVIRONMENT}:*") -> Any:
-        """List all keys in redis cache"""
-        return self.client.keys(pattern)
+    async def list_keys(self, pattern: str = f"mlops:{SETTINGS.ENVIRONMENT}:*") -> Any:
+        """List all keys in redis cache (SCAN, không block Redis như KEYS)"""
+
+        async def _scan() -> list:
+            return [
+                key async for key in self.client.scan_iter(match=pattern, count=1000)
+            ]
+
+        try:
+            return await redis_health.run(_scan(), timeout=redis_health.write_timeout)
+        except RedisUnavailableError as e:
+            logging.warning(f"Could not list keys: {pattern}, error: {e}")
+            return []
 
 
 standard_cache = StandardCache()
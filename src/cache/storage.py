@@ -0,0 +1,213 @@
+"""
+Lưu trữ gọn cho các cache entry trên Redis.
+
+- PayloadCodec: nén payload JSON (zlib hoặc zstd), byte đầu là header cho biết
+  codec nên đọc được cả entry cũ và entry ghi bằng codec khác.
+- NamespaceBudget: giới hạn số entry và số byte cho mỗi namespace, evict theo
+  LRU hoặc LFU. Metadata nằm trong các key phụ:
+      {prefix}{namespace}:rank    zset key -> last access (LRU) / số lần hit (LFU)
+      {prefix}{namespace}:expiry  zset key -> thời điểm hết TTL
+      {prefix}{namespace}:size    hash key -> số byte của entry
+      {prefix}{namespace}:bytes   tổng số byte của namespace
+"""
+
+import json
+import logging
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Tuple
+
+from src.config.settings import SETTINGS
+
+logger = logging.getLogger(__name__)
+
+
+class PayloadDecodeError(Exception):
+    """Payload không đọc được: header lạ, JSON hỏng, thiếu thư viện giải nén, ..."""
+
+
+class PayloadCodec:
+    RAW = b"\x00"
+    ZLIB = b"\x01"
+    ZSTD = b"\x02"
+
+    def __init__(
+        self,
+        compression: str = SETTINGS.SEMANTIC_CACHE_COMPRESSION,
+        level: int = 3,
+    ):
+        if compression not in ("none", "zlib", "zstd"):
+            raise ValueError(f"Unknown compression: {compression}")
+        if compression == "zstd":
+            try:
+                import zstandard
+            except ImportError:
+                logger.warning("zstandard is not installed, falling back to zlib")
+                compression = "zlib"
+            else:
+                self._zstd_compressor = zstandard.ZstdCompressor(level=level)
+        self.compression = compression
+        self.level = level
+        self._zstd_decompressor = None
+
+    def encode(self, data: Any) -> bytes:
+        raw = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode(
+            "utf-8"
+        )
+        if self.compression == "zstd":
+            return self.ZSTD + self._zstd_compressor.compress(raw)
+        if self.compression == "zlib":
+            return self.ZLIB + zlib.compress(raw, self.level)
+        return self.RAW + raw
+
+    def decode(self, payload: bytes | str) -> Any:
+        """Mọi lỗi khi đọc payload đều được gói thành PayloadDecodeError"""
+        try:
+            return self._decode(payload)
+        except Exception as e:
+            raise PayloadDecodeError(f"{type(e).__name__}: {e}") from e
+
+    def _decode(self, payload: bytes | str) -> Any:
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        header, body = payload[:1], payload[1:]
+        if header == self.ZLIB:
+            return json.loads(zlib.decompress(body))
+        if header == self.ZSTD:
+            if self._zstd_decompressor is None:
+                import zstandard
+
+                self._zstd_decompressor = zstandard.ZstdDecompressor()
+            return json.loads(self._zstd_decompressor.decompress(body))
+        if header == self.RAW:
+            return json.loads(body)
+        # Entry JSON thuần (ghi trước khi có codec)
+        return json.loads(payload)
+
+
+class NamespaceBudget:
+    def __init__(
+        self,
+        redis,
+        prefix: str,
+        max_entries: int = SETTINGS.SEMANTIC_CACHE_MAX_ENTRIES,
+        max_bytes: int = SETTINGS.SEMANTIC_CACHE_MAX_BYTES,
+        policy: str = SETTINGS.SEMANTIC_CACHE_EVICTION_POLICY,
+        evict_batch_size: int = 32,
+    ):
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"Unknown eviction policy: {policy}")
+        self.redis = redis
+        self.prefix = prefix
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.evict_batch_size = evict_batch_size
+        self.namespaces_key = f"{prefix}namespaces"
+        self.evictions = 0
+
+    def _keys(self, namespace: str) -> Tuple[str, str, str, str]:
+        base = f"{self.prefix}{namespace}:"
+        return base + "rank", base + "expiry", base + "size", base + "bytes"
+
+    async def old_sizes(self, entries: List[Tuple[str, str, int]]) -> List[int]:
+        """Size hiện tại của các key sắp ghi đè (0 nếu chưa có), một round trip"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for namespace, key, _ in entries:
+                pipe.hget(self._keys(namespace)[2], key)
+            sizes = await pipe.execute()
+        return [int(size) if size else 0 for size in sizes]
+
+    def record(
+        self,
+        pipe,
+        entries: List[Tuple[str, str, int]],
+        old_sizes: List[int],
+        ttl: int,
+    ):
+        """Thêm lệnh cập nhật metadata của các entry (namespace, key, nbytes) vào pipeline"""
+        now = time.time()
+        for (namespace, key, nbytes), old_size in zip(entries, old_sizes):
+            rank, expiry, size, total = self._keys(namespace)
+            if self.policy == "lru":
+                pipe.zadd(rank, {key: now})
+            else:
+                pipe.zadd(rank, {key: 1}, nx=True)
+            pipe.zadd(expiry, {key: now + ttl})
+            pipe.hset(size, key, nbytes)
+            pipe.incrby(total, nbytes - old_size)
+            pipe.sadd(self.namespaces_key, namespace)
+
+    async def touch(self, namespace: str, key: str):
+        """Cập nhật rank khi entry được hit"""
+        rank = self._keys(namespace)[0]
+        if self.policy == "lru":
+            await self.redis.zadd(rank, {key: time.time()}, xx=True)
+        else:
+            await self.redis.zadd(rank, {key: 1}, xx=True, incr=True)
+
+    async def _forget(self, namespace: str, keys: List[Any], delete: bool):
+        rank, expiry, size, total = self._keys(namespace)
+        sizes = await self.redis.hmget(size, keys)
+        freed = sum(int(s) for s in sizes if s)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if delete:
+                pipe.delete(*keys)
+            pipe.zrem(rank, *keys)
+            pipe.zrem(expiry, *keys)
+            pipe.hdel(size, *keys)
+            pipe.decrby(total, freed)
+            await pipe.execute()
+
+    async def enforce(self, namespaces: Iterable[str]):
+        """Dọn metadata của entry đã hết TTL rồi evict tới khi namespace nằm trong budget"""
+        for namespace in set(namespaces):
+            rank, expiry, _, total = self._keys(namespace)
+
+            expired = await self.redis.zrangebyscore(expiry, "-inf", time.time())
+            if expired:
+                await self._forget(namespace, expired, delete=False)
+
+            while True:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.zcard(rank)
+                    pipe.get(total)
+                    n_entries, n_bytes = await pipe.execute()
+                n_bytes = int(n_bytes or 0)
+
+                excess = n_entries - self.max_entries
+                if excess <= 0 and n_bytes <= self.max_bytes:
+                    break
+                # Rank thấp nhất = lâu nhất chưa dùng (LRU) / ít hit nhất (LFU)
+                victims = await self.redis.zrange(
+                    rank, 0, max(excess, self.evict_batch_size) - 1
+                )
+                if not victims:
+                    break
+                await self._forget(namespace, victims, delete=True)
+                self.evictions += len(victims)
+
+    async def stats(self) -> Dict[str, Any]:
+        """Số entry, tổng byte và byte trung bình mỗi entry theo namespace"""
+        namespaces = sorted(
+            ns.decode() if isinstance(ns, bytes) else ns
+            for ns in await self.redis.smembers(self.namespaces_key)
+        )
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for namespace in namespaces:
+                rank, _, _, total = self._keys(namespace)
+                pipe.zcard(rank)
+                pipe.get(total)
+            results = await pipe.execute()
+
+        stats = {}
+        for i, namespace in enumerate(namespaces):
+            n_entries, n_bytes = results[2 * i], int(results[2 * i + 1] or 0)
+            stats[namespace] = {
+                "entries": n_entries,
+                "bytes": n_bytes,
+                "bytes_per_entry": n_bytes / n_entries if n_entries else 0.0,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
+        return {"policy": self.policy, "evictions": self.evictions, "namespaces": stats}
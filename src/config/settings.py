@@ -29,11 +29,74 @@ class Settings(BaseSettings):
     # RAG Configuration
     CHROMA_COLLECTION_NAME: str = "rag-pipeline"
     CHROMA_PERSIST_DIR: str = str(PROJECT_ROOT / "DATA" / "chromadb")
+    VECTOR_STORE_BACKEND: str = "chroma"  # "chroma" | "numpy"
+    NUMPY_INDEX_DIR: str = str(PROJECT_ROOT / "DATA" / "numpy_index")
+    RETRIEVAL_MAX_WORKERS: int = 4
+    RETRIEVAL_MODE: str = "dense"  # "dense" | "hybrid"
+    # Rỗng = <CHROMA_PERSIST_DIR>/bm25/<CHROMA_COLLECTION_NAME>.json.gz (giống pipeline ingest)
+    BM25_INDEX_PATH: str = ""
+    HYBRID_CANDIDATES: int = 20
+    HYBRID_RRF_K: int = 60
+    HYBRID_LATENCY_BUDGET_MS: float = 50.0
+    RERANK_ENABLED: bool = False
+    RERANK_MODEL_NAME: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES: int = 20
+    RERANK_MAX_LENGTH: int = 256
+    RERANK_BUDGET_MS: float = 150.0
+    RERANK_MAX_WORKERS: int = 1
+    TOOL_MAX_CONCURRENCY: int = 4
+    CONTEXT_MAX_TOKENS: int = 2000
+    CONTEXT_MIN_OVERLAP_CHARS: int = 40
+    CONTEXT_TOKENIZER_NAME: str = "sentence-transformers/all-mpnet-base-v2"
+
+    # Embedding Configuration
+    EMBEDDING_MODEL_NAME: str = "sentence-transformers/all-mpnet-base-v2"
+    EMBEDDING_BACKEND: str = "torch"  # "torch" | "onnx"
+    EMBEDDING_ONNX_DIR: str = str(PROJECT_ROOT / "DATA" / "onnx")
+    EMBEDDING_ONNX_THREADS: int = 4
+    EMBEDDING_ONNX_QUANTIZE: bool = True
+    EMBEDDING_PARITY_MIN_COSINE: float = 0.99
+    EMBEDDING_BATCH_ENABLED: bool = True
+    EMBEDDING_BATCH_MAX_SIZE: int = 32
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 5.0
+    EMBEDDING_CACHE_MAX_SIZE: int = 10000
+    EMBEDDING_CACHE_TTL: float = 3600
 
     # Performance & Caching
     CACHE_TTL: int = 3600
     MAX_RESPONSE_LENGTH: int = 2048
     REDIS_URI: str = "localhost:6378"
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_OP_TIMEOUT_MS: float = 100.0  # lookup trên request path
+    REDIS_WRITE_TIMEOUT_MS: float = 1000.0  # write-behind, refresh, warm-up
+    REDIS_BREAKER_FAILURE_THRESHOLD: int = 5
+    REDIS_BREAKER_PROBE_INTERVAL_S: float = 2.0
+    STANDARD_CACHE_REFRESH_LOCK_MS: int = 10000
+    SEMANTIC_CACHE_TTL: int = 20
+    SEMANTIC_CACHE_DISTANCE_THRESHOLD: float = 0.2
+    SEMANTIC_CACHE_VECTOR_DTYPE: str = "float32"  # "float32" | "float16"
+    SEMANTIC_CACHE_COMPRESSION: str = "zlib"  # "none" | "zlib" | "zstd"
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 10000  # mỗi namespace
+    SEMANTIC_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # mỗi namespace
+    SEMANTIC_CACHE_EVICTION_POLICY: str = "lru"  # "lru" | "lfu"
+    SEMANTIC_CACHE_WRITE_QUEUE_SIZE: int = 1000
+    SEMANTIC_CACHE_WRITE_BATCH_SIZE: int = 64
+    SEMANTIC_CACHE_L1_MAX_SIZE: int = 1024
+    SSE_REPLAY_FRAME_BYTES: int = 2048
+    SSE_REPLAY_FRAME_CHUNKS: int = 64
+    CACHE_WARMUP_FILE: str = ""  # jsonl replay file, rỗng = không warm lúc startup
+    CACHE_WARMUP_CONCURRENCY: int = 4
+    CACHE_WARMUP_RATE_PER_SEC: float = 2.0
+    CACHE_WARMUP_LIMIT: int = 500
+
+    # Session history
+    SESSION_STORE_BACKEND: str = "memory"  # "memory" | "redis"
+    SESSION_TTL: int = 3600  # tính từ lần ghi gần nhất
+    SESSION_MAX_SESSIONS: int = 10000  # chỉ áp dụng cho in-memory
+    SESSION_MAX_MESSAGES: int = 50
+    SUMMARY_TRIGGER_TOKENS: int = 1000  # tóm tắt khi phần chưa tóm tắt vượt ngưỡng
+    SUMMARY_KEEP_LAST: int = 2  # số message gần nhất giữ nguyên văn
+    SUMMARY_MAX_CONCURRENCY: int = 2
 
     @property
     def llm_config(self) -> Dict[str, Any]:
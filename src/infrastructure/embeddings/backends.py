@@ -0,0 +1,176 @@
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, List
+
+import numpy as np
+
+from src.config.settings import SETTINGS
+from src.utils import logger
+
+
+class EmbeddingBackend(ABC):
+    """Base class cho các backend encode text -> vector (đã L2-normalize)"""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    @abstractmethod
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode a batch of texts into an (n, dim) float32 matrix of unit vectors."""
+        pass
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """Backend mặc định: PyTorch fp32 qua SentenceTransformer"""
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        vectors = self.model.encode(texts, normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    Backend ONNX Runtime cho CPU, có thể dynamic-quantize weights sang int8.
+
+    Model được export một lần vào `export_dir` (optimum) rồi dùng lại cho các
+    lần khởi động sau. Pooling (mean) và normalize làm giống SentenceTransformer
+    để vector tương thích với dữ liệu đã ingest trong Chroma.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        num_threads: int = SETTINGS.EMBEDDING_ONNX_THREADS,
+        quantize: bool = SETTINGS.EMBEDDING_ONNX_QUANTIZE,
+        export_dir: str = SETTINGS.EMBEDDING_ONNX_DIR,
+        max_seq_length: int = 384,
+    ):
+        super().__init__(model_name)
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError(
+                "EMBEDDING_BACKEND=onnx requires `onnxruntime` and `optimum[onnxruntime]`"
+            ) from e
+
+        model_dir = Path(export_dir) / model_name.replace("/", "__")
+        model_path = self._prepare_model(model_dir, quantize)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.session = ort.InferenceSession(
+            str(model_path), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+        self.max_seq_length = max_seq_length
+        logger.info(
+            f"ONNX embedding backend ready: {model_path.name} (threads={num_threads})"
+        )
+
+    def _prepare_model(self, model_dir: Path, quantize: bool) -> Path:
+        """Export model sang ONNX (và quantize) nếu chưa có trên disk"""
+        fp32_path = model_dir / "model.onnx"
+        int8_path = model_dir / "model_quantized.onnx"
+
+        if not fp32_path.exists():
+            from optimum.onnxruntime import ORTModelForFeatureExtraction
+            from transformers import AutoTokenizer
+
+            logger.info(f"Exporting {self.model_name} to ONNX at {model_dir}")
+            ORTModelForFeatureExtraction.from_pretrained(
+                self.model_name, export=True
+            ).save_pretrained(model_dir)
+            AutoTokenizer.from_pretrained(self.model_name).save_pretrained(model_dir)
+
+        if not quantize:
+            return fp32_path
+
+        if not int8_path.exists():
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            logger.info(f"Quantizing {fp32_path.name} to int8 (dynamic)")
+            quantize_dynamic(
+                str(fp32_path), str(int8_path), weight_type=QuantType.QInt8
+            )
+        return int8_path
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        inputs = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np",
+        )
+        feed = {
+            k: v.astype(np.int64) for k, v in inputs.items() if k in self.input_names
+        }
+        token_embeddings = self.session.run(None, feed)[0]
+
+        # Mean pooling theo attention mask, rồi L2-normalize
+        mask = inputs["attention_mask"][..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        vectors = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+        vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors.astype(np.float32)
+
+
+def build_backend(backend: str, model_name: str) -> EmbeddingBackend:
+    """Tạo backend theo setting EMBEDDING_BACKEND ("torch" | "onnx")"""
+    if backend == "torch":
+        return SentenceTransformerBackend(model_name)
+    if backend == "onnx":
+        return OnnxBackend(model_name)
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+def check_parity(
+    reference: EmbeddingBackend,
+    candidate: EmbeddingBackend,
+    texts: List[str],
+) -> dict[str, Any]:
+    """So sánh cosine giữa vector của candidate và reference (thường là PyTorch)"""
+    ref = reference.encode(texts)
+    cand = candidate.encode(texts)
+    # Vector đã normalize nên cosine chính là dot product
+    cosines = np.sum(ref * cand, axis=1)
+    return {
+        "num_texts": len(texts),
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean()),
+    }
+
+
+PARITY_TEXTS = [
+    "What do beetles eat?",
+    "Attention Is All You Need introduced the Transformer architecture.",
+    "Chain-of-thought prompting elicits reasoning in large language models.",
+    "Quy định về thu hồi, xử lý pin và ắc quy thải bỏ.",
+    "EPA workshop on lithium-ion battery handling and recycling.",
+]
+
+
+if __name__ == "__main__":
+    # python -m src.infrastructure.embeddings.backends
+    report = check_parity(
+        SentenceTransformerBackend(SETTINGS.EMBEDDING_MODEL_NAME),
+        OnnxBackend(SETTINGS.EMBEDDING_MODEL_NAME),
+        PARITY_TEXTS,
+    )
+    logger.info(f"ONNX vs PyTorch parity: {report}")
+    if report["min_cosine"] < SETTINGS.EMBEDDING_PARITY_MIN_COSINE:
+        logger.warning(
+            f"Cosine agreement below {SETTINGS.EMBEDDING_PARITY_MIN_COSINE}, "
+            "consider EMBEDDING_ONNX_QUANTIZE=false"
+        )
@@ -0,0 +1,98 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+from src.utils import logger
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batching scheduler cho embedding model.
+
+    Các request embed đồng thời (từ nhiều thread hoặc từ event loop) được đưa vào
+    một queue chung. Một worker thread gom chúng trong một cửa sổ ngắn
+    (`max_wait_ms`) hoặc tới khi đủ `max_batch_size`, gọi `encode_fn` đúng một lần
+    cho cả batch rồi trả vector tương ứng về cho từng caller.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._worker: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, text: str) -> Future:
+        """Đưa một text vào queue, trả về Future chứa vector của text đó."""
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def embed(self, text: str) -> np.ndarray:
+        """Blocking API cho các caller sync (Chroma, vector store, ...)."""
+        return self.submit(text).result()
+
+    async def aembed(self, text: str) -> np.ndarray:
+        """Async API: chờ kết quả mà không block event loop."""
+        return await asyncio.wrap_future(self.submit(text))
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="embedding-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def _collect_batch(self) -> List[Tuple[str, Future]]:
+        # Chờ request đầu tiên, sau đó gom thêm cho tới khi hết cửa sổ hoặc đủ batch
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            # Bỏ qua các future đã bị cancel bởi caller
+            batch = [(t, f) for t, f in batch if f.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            # Text trùng nhau trong cùng batch chỉ encode một lần
+            unique_texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                vectors = self.encode_fn(unique_texts)
+            except Exception as e:
+                logger.error(f"Embedding batch of {len(unique_texts)} failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            index = {text: i for i, text in enumerate(unique_texts)}
+            for text, future in batch:
+                # Mỗi caller nhận bản copy riêng: caller trùng text không dùng chung
+                # một row, và vector không giữ cả ma trận của batch
+                future.set_result(vectors[index[text]].copy())
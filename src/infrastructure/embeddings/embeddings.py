@@ -1,23 +1,126 @@
-from sentence_transformers import SentenceTransformer
-from typing import List
+import asyncio
+import threading
+from typing import Any, List
 from langchain.embeddings.base import Embeddings
 import numpy as np
+from src.cache.embedding_cache import EmbeddingCache, embedding_cache
+from src.config.settings import SETTINGS
+from src.infrastructure.embeddings.backends import EmbeddingBackend, build_backend
+from src.infrastructure.embeddings.batcher import EmbeddingBatcher
 
 
 class EmbeddingService(Embeddings):
-    def __init__(self, model_name: str = "sentence-transformers/all-mpnet-base-v2"):
-        self.embedding_model = SentenceTransformer(model_name)
+    def __init__(
+        self,
+        model_name: str = SETTINGS.EMBEDDING_MODEL_NAME,
+        backend: str = SETTINGS.EMBEDDING_BACKEND,
+        cache: EmbeddingCache | None = embedding_cache,
+    ):
+        self.model_name = model_name
+        # PyTorch (mặc định) hoặc ONNX Runtime int8 cho các node chỉ có CPU.
+        # Model chỉ được load ở lần dùng đầu tiên (hoặc khi warmup), không phải lúc import
+        self.backend_name = backend
+        self._backend: EmbeddingBackend | None = None
+        self._backend_lock = threading.Lock()
+        # Cache dùng chung: semantic cache và vector store đều embed qua service này
+        self.cache = cache
 
+        # Gom các embed_query đồng thời thành một lần encode theo batch
+        self.batcher = (
+            EmbeddingBatcher(
+                encode_fn=self._encode,
+                max_batch_size=SETTINGS.EMBEDDING_BATCH_MAX_SIZE,
+                max_wait_ms=SETTINGS.EMBEDDING_BATCH_MAX_WAIT_MS,
+            )
+            if SETTINGS.EMBEDDING_BATCH_ENABLED
+            else None
+        )
+
+    @property
+    def backend(self) -> EmbeddingBackend:
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    self._backend = build_backend(self.backend_name, self.model_name)
+        return self._backend
+
+    def warmup(self):
+        """Load model và chạy một forward pass để tránh cold start ở request đầu tiên"""
+        self._encode(["warmup"])
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Encode a batch of texts into normalized vectors in one forward pass."""
+        return self.backend.encode(texts)
+
+    def _cache_get(self, text: str) -> np.ndarray | None:
+        if self.cache is None:
+            return None
+        return self.cache.get(text, self.model_name)
+
+    def _cache_set(self, text: str, vector: np.ndarray):
+        if self.cache is not None:
+            self.cache.set(text, self.model_name, vector)
+
+    def embed_query_np(self, text: str) -> np.ndarray:
+        """Embed a single text and return a contiguous float32 vector (read-only)."""
+        vector = self._cache_get(text)
+        if vector is None:
+            if self.batcher is not None:
+                vector = self.batcher.embed(text)
+            else:
+                vector = self._encode([text])[0]
+            vector = self._as_float32(vector)
+            self._cache_set(text, vector)
+        return vector
+
+    async def aembed_query_np(self, text: str) -> np.ndarray:
+        """Async version of embed_query_np that does not block the event loop."""
+        vector = self._cache_get(text)
+        if vector is None:
+            if self.batcher is not None:
+                vector = await self.batcher.aembed(text)
+            else:
+                vector = (await asyncio.to_thread(self._encode, [text]))[0]
+            vector = self._as_float32(vector)
+            self._cache_set(text, vector)
+        return vector
+
+    def embed_documents_np(self, texts: List[str]) -> np.ndarray:
+        """Embed a list of texts and return a contiguous (n, dim) float32 matrix."""
+        vectors: List[np.ndarray | None] = [self._cache_get(text) for text in texts]
+
+        # Chỉ encode các text chưa có trong cache, trong một lần gọi duy nhất
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            encoded = self._as_float32(self._encode([texts[i] for i in missing]))
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
+                self._cache_set(texts[i], vector)
+
+        if not vectors:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack(vectors)
+
+    # ---- LangChain Embeddings interface (list-based, giữ để tương thích) ----
     def embed_query(self, text: str) -> List[float]:
         """Embed a single text (normalized vector) and return as list."""
-        # SentenceTransformer.encode returns a numpy array for a single string
-        vector = self.embedding_model.encode(text, normalize_embeddings=True)
-        return np.array(vector).tolist()
+        return self.embed_query_np(text).tolist()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Embed a single text without blocking the event loop."""
+        return (await self.aembed_query_np(text)).tolist()
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Embed a list of texts (normalized vectors) and return as list of lists."""
-        vectors = self.embedding_model.encode(texts, normalize_embeddings=True)
-        return np.array(vectors).tolist()
+        return self.embed_documents_np(texts).tolist()
+
+    @staticmethod
+    def _as_float32(vectors: np.ndarray) -> np.ndarray:
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+    def stats(self) -> dict[str, Any]:
+        """Hit/miss counters of the shared embedding cache."""
+        return self.cache.stats() if self.cache is not None else {}
 
 
 embedding_service = EmbeddingService()
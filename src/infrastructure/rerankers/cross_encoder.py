@@ -0,0 +1,137 @@
+"""
+CPU cross-encoder rerank stage chạy sau vector search.
+
+Over-fetch N candidate từ vector store, chấm điểm tất cả (query, chunk) trong
+một forward pass batched rồi giữ lại top_k. Mỗi request có time budget cứng:
+quá budget thì trả về thứ tự của vector search thay vì chờ model.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from langchain.schema.document import Document
+
+from src.config.settings import SETTINGS
+from src.utils import logger
+
+
+class CrossEncoderReranker:
+    def __init__(
+        self,
+        model_name: str = SETTINGS.RERANK_MODEL_NAME,
+        max_length: int = SETTINGS.RERANK_MAX_LENGTH,
+        budget_ms: float = SETTINGS.RERANK_BUDGET_MS,
+        max_workers: int = SETTINGS.RERANK_MAX_WORKERS,
+    ):
+        self.model_name = model_name
+        self.max_length = max_length
+        self.budget_ms = budget_ms
+        self._model = None
+        self._model_lock = threading.Lock()
+        # Pool nhỏ: request vượt quá khả năng của CPU sẽ hết budget và fallback
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="rerank"
+        )
+
+        self._stats_lock = threading.Lock()
+        self._latencies_ms: deque = deque(maxlen=1024)
+        self._calls = 0
+        self._timeouts = 0
+        self._errors = 0
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+
+                    self._model = CrossEncoder(
+                        self.model_name, max_length=self.max_length, device="cpu"
+                    )
+                    logger.info(f"Loaded cross-encoder {self.model_name} (CPU)")
+        return self._model
+
+    def warmup(self):
+        """Load model và chạy một forward pass trước khi nhận traffic"""
+        self.model.predict([("warmup", "warmup")])
+
+    def _score(self, query: str, docs: List[Document]) -> np.ndarray:
+        pairs = [(query, doc.page_content) for doc in docs]
+        return np.asarray(
+            self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False),
+            dtype=np.float32,
+        )
+
+    def rerank(
+        self,
+        query: str,
+        hits: List[Tuple[Document, float]],
+        top_k: int,
+        budget_ms: float | None = None,
+    ) -> List[Tuple[Document, float]]:
+        """
+        Sắp xếp lại hits theo cross-encoder score (càng lớn càng liên quan).
+
+        Quá budget hoặc lỗi thì trả về hits[:top_k] giữ nguyên score của vector search.
+        """
+        if len(hits) <= 1:
+            return hits[:top_k]
+
+        budget_ms = self.budget_ms if budget_ms is None else budget_ms
+        start = time.perf_counter()
+        future = self._executor.submit(self._score, query, [doc for doc, _ in hits])
+        try:
+            scores = future.result(timeout=budget_ms / 1000)
+        except FutureTimeoutError:
+            # Nếu còn nằm trong queue thì bỏ luôn, không tốn CPU cho kết quả không dùng
+            future.cancel()
+            self._record(start, timeout=True)
+            logger.warning(
+                f"Rerank exceeded {budget_ms:.0f}ms budget, using vector order"
+            )
+            return hits[:top_k]
+        except Exception as e:
+            self._record(start, error=True)
+            logger.error(f"Rerank failed, using vector order: {e}")
+            return hits[:top_k]
+
+        self._record(start)
+        order = np.argsort(-scores)[:top_k]
+        return [(hits[i][0], float(scores[i])) for i in order]
+
+    def _record(self, start: float, timeout: bool = False, error: bool = False):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self._calls += 1
+            self._timeouts += int(timeout)
+            self._errors += int(error)
+            self._latencies_ms.append(elapsed_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        """Timing metrics của rerank stage (latency tính trên 1024 request gần nhất)"""
+        with self._stats_lock:
+            latencies = np.asarray(self._latencies_ms, dtype=np.float64)
+            calls, timeouts, errors = self._calls, self._timeouts, self._errors
+
+        stats = {
+            "calls": calls,
+            "timeouts": timeouts,
+            "errors": errors,
+            "fallback_rate": (timeouts + errors) / calls if calls else 0.0,
+            "budget_ms": self.budget_ms,
+        }
+        if len(latencies):
+            stats.update(
+                {
+                    "latency_ms_p50": float(np.percentile(latencies, 50)),
+                    "latency_ms_p95": float(np.percentile(latencies, 95)),
+                    "latency_ms_max": float(latencies.max()),
+                }
+            )
+        return stats
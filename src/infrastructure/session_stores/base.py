@@ -0,0 +1,58 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List
+
+Message = Dict[str, Any]
+
+
+class SessionStore(ABC):
+    """
+    Interface lưu chat history theo session_id (in-memory, Redis, ...).
+
+    Mỗi message là dict `{"role": ..., "content": ...}`. Session hết hạn sau
+    `ttl` giây kể từ lần ghi gần nhất; mỗi session giữ tối đa `max_messages`
+    message mới nhất. Summary ghi bằng `compact` nằm riêng ở đầu history,
+    không tính vào `max_messages` nên không bị trim mất.
+    """
+
+    def __init__(self, ttl: int, max_messages: int):
+        self.ttl = ttl
+        self.max_messages = max_messages
+
+    @abstractmethod
+    async def get(self, session_id: str) -> List[Message]:
+        """History của session, [] nếu chưa có hoặc đã hết hạn"""
+        pass
+
+    @abstractmethod
+    async def append(self, session_id: str, messages: List[Message]):
+        """Thêm message vào cuối history và gia hạn TTL"""
+        pass
+
+    @abstractmethod
+    async def compact(
+        self,
+        session_id: str,
+        summary: Message,
+        consumed: int,
+        expected_head: Message | None = None,
+    ) -> bool:
+        """
+        Thay `consumed` message đầu tiên (tính cả summary cũ, theo thứ tự của
+        `get`) bằng một message summary. Message được append sau khi summary
+        bắt đầu chạy vẫn được giữ nguyên.
+
+        Nếu có `expected_head` thì chỉ compact khi message đầu tiên vẫn là nó
+        (chưa bị compact bởi worker khác). Trả về False nếu bỏ qua.
+        """
+        pass
+
+    @abstractmethod
+    async def delete(self, session_id: str):
+        pass
+
+    async def close(self):
+        """Giải phóng connection (nếu có) khi shutdown"""
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": type(self).__name__, "ttl": self.ttl}
@@ -0,0 +1,57 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.cache.lru import LRUCache
+from src.config.settings import SETTINGS
+from src.infrastructure.session_stores.base import Message, SessionStore
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Session history trong process, giới hạn số session (LRU) và TTL.
+
+    Chỉ phù hợp khi chạy một worker: mỗi uvicorn worker có store riêng.
+    """
+
+    def __init__(
+        self,
+        ttl: int = SETTINGS.SESSION_TTL,
+        max_messages: int = SETTINGS.SESSION_MAX_MESSAGES,
+        max_sessions: int = SETTINGS.SESSION_MAX_SESSIONS,
+    ):
+        super().__init__(ttl=ttl, max_messages=max_messages)
+        # session_id -> (summary hoặc None, message chưa tóm tắt)
+        self.sessions = LRUCache(maxsize=max_sessions, ttl=ttl)
+
+    def _load(self, session_id: str) -> Tuple[Optional[Message], List[Message]]:
+        return self.sessions.get(session_id) or (None, [])
+
+    async def get(self, session_id: str) -> List[Message]:
+        # Trả bản copy để caller sửa list không ảnh hưởng store
+        summary, messages = self._load(session_id)
+        return ([summary] if summary else []) + list(messages)
+
+    async def append(self, session_id: str, messages: List[Message]):
+        summary, history = self._load(session_id)
+        history = history + list(messages)
+        self.sessions.set(session_id, (summary, history[-self.max_messages :]))
+
+    async def compact(
+        self,
+        session_id: str,
+        summary: Message,
+        consumed: int,
+        expected_head: Message | None = None,
+    ) -> bool:
+        current_summary, messages = self._load(session_id)
+        head = current_summary or (messages[0] if messages else None)
+        if head is None or (expected_head is not None and head != expected_head):
+            return False
+        start = consumed - 1 if current_summary else consumed
+        self.sessions.set(session_id, (summary, messages[start:]))
+        return True
+
+    async def delete(self, session_id: str):
+        self.sessions.delete(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "sessions": self.sessions.stats()}
@@ -0,0 +1,143 @@
+import json
+import logging
+from typing import Any, Dict, List
+
+import redis.asyncio as aioredis
+from redis.exceptions import WatchError
+
+from src.cache.redis_health import RedisUnavailableError, redis_health
+from src.config.settings import SETTINGS
+from src.infrastructure.session_stores.base import Message, SessionStore
+
+logger = logging.getLogger(__name__)
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Session history trên Redis, dùng chung cho mọi worker.
+
+    Mỗi session là một list `{prefix}{session_id}`, mỗi phần tử là một message
+    JSON gọn (không khoảng trắng, giữ nguyên unicode). Append là một pipeline
+    RPUSH + LTRIM + EXPIRE. Summary nằm ở string key riêng
+    `{summary_prefix}{session_id}` để LTRIM không evict nó. Redis lỗi thì
+    request chạy với history rỗng thay vì chờ timeout (qua redis_health).
+    """
+
+    def __init__(
+        self,
+        redis_url: str = f"redis://{SETTINGS.REDIS_URI}",
+        ttl: int = SETTINGS.SESSION_TTL,
+        max_messages: int = SETTINGS.SESSION_MAX_MESSAGES,
+        max_connections: int = SETTINGS.REDIS_MAX_CONNECTIONS,
+    ):
+        super().__init__(ttl=ttl, max_messages=max_messages)
+        self.prefix = f"session:{SETTINGS.ENVIRONMENT}:"
+        self.summary_prefix = f"session_summary:{SETTINGS.ENVIRONMENT}:"
+        self.pool = aioredis.ConnectionPool.from_url(
+            redis_url, max_connections=max_connections, **redis_health.client_kwargs()
+        )
+        self.redis = aioredis.Redis(connection_pool=self.pool)
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}{session_id}"
+
+    def _summary_key(self, session_id: str) -> str:
+        return f"{self.summary_prefix}{session_id}"
+
+    @staticmethod
+    def _encode(message: Message) -> str:
+        return json.dumps(message, ensure_ascii=False, separators=(",", ":"))
+
+    async def get(self, session_id: str) -> List[Message]:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.get(self._summary_key(session_id))
+            pipe.lrange(self._key(session_id), 0, -1)
+            try:
+                summary, raw = await redis_health.run(pipe.execute())
+            except RedisUnavailableError as e:
+                logger.debug("Session store unavailable, using empty history: %s", e)
+                return []
+        history = [json.loads(summary)] if summary else []
+        history.extend(json.loads(item) for item in raw)
+        return history
+
+    async def _execute(self, pipe):
+        try:
+            await redis_health.run(pipe.execute(), timeout=redis_health.write_timeout)
+        except RedisUnavailableError as e:
+            logger.warning("Session store write skipped: %s", e)
+
+    async def append(self, session_id: str, messages: List[Message]):
+        if not messages:
+            return
+        key = self._key(session_id)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.rpush(key, *(self._encode(m) for m in messages))
+            pipe.ltrim(key, -self.max_messages, -1)
+            pipe.expire(key, self.ttl)
+            pipe.expire(self._summary_key(session_id), self.ttl)
+            await self._execute(pipe)
+
+    async def compact(
+        self,
+        session_id: str,
+        summary: Message,
+        consumed: int,
+        expected_head: Message | None = None,
+    ) -> bool:
+        try:
+            return await redis_health.run(
+                self._compact(session_id, summary, consumed, expected_head),
+                timeout=redis_health.write_timeout,
+            )
+        except RedisUnavailableError as e:
+            logger.warning("Session store compact skipped: %s", e)
+            return False
+
+    async def _compact(
+        self,
+        session_id: str,
+        summary: Message,
+        consumed: int,
+        expected_head: Message | None,
+        retries: int = 3,
+    ) -> bool:
+        # WATCH + MULTI: ghi summary mới rồi bỏ phần message đã được tóm tắt,
+        # message append trong lúc summarize vẫn được giữ
+        key, summary_key = self._key(session_id), self._summary_key(session_id)
+        for _ in range(retries):
+            async with self.redis.pipeline(transaction=True) as pipe:
+                try:
+                    await pipe.watch(key, summary_key)
+                    current_summary = await pipe.get(summary_key)
+                    head = current_summary or await pipe.lindex(key, 0)
+                    if head is None or (
+                        expected_head is not None and json.loads(head) != expected_head
+                    ):
+                        return False
+                    # `consumed` tính cả summary cũ ở đầu history
+                    start = consumed - 1 if current_summary else consumed
+                    pipe.multi()
+                    pipe.ltrim(key, start, -1)
+                    pipe.set(summary_key, self._encode(summary), ex=self.ttl)
+                    pipe.expire(key, self.ttl)
+                    await pipe.execute()
+                    return True
+                except WatchError:
+                    # Có append xen vào giữa WATCH và EXEC, thử lại
+                    continue
+        return False
+
+    async def delete(self, session_id: str):
+        try:
+            await redis_health.run(
+                self.redis.delete(self._key(session_id), self._summary_key(session_id))
+            )
+        except RedisUnavailableError as e:
+            logger.warning("Session store delete skipped: %s", e)
+
+    async def close(self):
+        await self.pool.disconnect()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "max_messages": self.max_messages}
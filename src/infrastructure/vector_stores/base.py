@@ -0,0 +1,370 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import partial
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from langchain.schema.document import Document
+
+from src.config.settings import SETTINGS
+from src.infrastructure.embeddings.embeddings import embedding_service
+from src.infrastructure.rerankers.cross_encoder import CrossEncoderReranker
+from src.schemas.domain.retrieval import RetrievalHit
+from src.infrastructure.vector_stores.bm25_index import (
+    LazyBM25Index,
+    reciprocal_rank_fusion,
+)
+from src.utils import logger
+
+
+def _format_docs(docs: List[Document], scores: List[float] | None = None) -> str:
+    formatted = []
+    for idx, doc in enumerate(docs):
+        content = doc.page_content.strip()
+        if scores:
+            content += f" [score={scores[idx]:.4f}]"
+        formatted.append(content)
+    return "\n\n".join(formatted)
+
+
+def _match_condition(value: Any, condition: Any) -> bool:
+    if not isinstance(condition, dict):
+        return value == condition
+
+    for op, operand in condition.items():
+        if op == "$eq" and not value == operand:
+            return False
+        if op == "$ne" and not value != operand:
+            return False
+        if op == "$in" and value not in operand:
+            return False
+        if op == "$nin" and value in operand:
+            return False
+        if op in ("$gt", "$gte", "$lt", "$lte"):
+            if value is None:
+                return False
+            if op == "$gt" and not value > operand:
+                return False
+            if op == "$gte" and not value >= operand:
+                return False
+            if op == "$lt" and not value < operand:
+                return False
+            if op == "$lte" and not value <= operand:
+                return False
+    return True
+
+
+def match_metadata(metadata: Dict[str, Any], where: Dict[str, Any]) -> bool:
+    """Đánh giá metadata filter theo cú pháp `where` của Chroma"""
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(match_metadata(metadata, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(match_metadata(metadata, sub) for sub in condition):
+                return False
+        elif not _match_condition(metadata.get(key), condition):
+            return False
+    return True
+
+
+class BaseVectorStore(ABC):
+    """
+    Interface chung cho các retrieval backend (Chroma, NumPy exact search, ...).
+
+    Subclass chỉ cần implement `search_by_vectors` và `get_by_ids`; phần embed
+    query, hybrid BM25 + dense, rerank, format kết quả và async API (chạy trong
+    retrieval pool) dùng chung ở đây.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = SETTINGS.RETRIEVAL_MAX_WORKERS,
+        retrieval_mode: str = SETTINGS.RETRIEVAL_MODE,
+        rerank_enabled: bool = SETTINGS.RERANK_ENABLED,
+    ):
+        self.embedding_service = embedding_service
+        # Pool giới hạn cho embedding + search, tách khỏi event loop
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="retrieval"
+        )
+
+        if retrieval_mode not in ("dense", "hybrid"):
+            raise ValueError(f"Unknown retrieval mode: {retrieval_mode}")
+        self.bm25 = LazyBM25Index() if retrieval_mode == "hybrid" else None
+        # Pool riêng cho BM25 để không tranh slot với chính retrieval pool
+        self._lexical_executor = (
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="lexical")
+            if self.bm25 is not None
+            else None
+        )
+        self.reranker = CrossEncoderReranker() if rerank_enabled else None
+
+    def warmup(self):
+        """Load index trước khi nhận traffic"""
+        if self.bm25 is not None:
+            self.bm25.get()
+        if self.reranker is not None:
+            self.reranker.warmup()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": "hybrid" if self.bm25 is not None else "dense",
+            "reranker": self.reranker.stats() if self.reranker is not None else None,
+        }
+
+    @abstractmethod
+    def search_by_vectors(
+        self,
+        query_embeddings: np.ndarray,
+        top_k: int = 3,
+        metadata_filter: Dict[str, Any] | None = None,
+    ) -> List[List[Tuple[Document, float]]]:
+        """
+        Tìm top_k chunk cho mỗi query vector.
+
+        Returns:
+            Một list (Document, distance) cho mỗi query, distance càng nhỏ càng gần.
+        """
+        pass
+
+    @abstractmethod
+    def get_by_ids(self, ids: List[str]) -> List[Document]:
+        """Lấy chunk theo id (dùng cho các hit chỉ có ở nhánh lexical)"""
+        pass
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 3,
+        metadata_filter: Dict[str, Any] | None = None,
+    ) -> List[Tuple[Document, float]]:
+        """
+        Search một query theo RETRIEVAL_MODE, rồi rerank nếu RERANK_ENABLED.
+
+        Dense: score là distance (càng nhỏ càng gần).
+        Hybrid: score là RRF score của BM25 + dense (càng lớn càng liên quan).
+        Rerank: score là cross-encoder score (càng lớn càng liên quan); khi
+        rerank fallback thì giữ score của stage trước.
+        """
+        if self.reranker is None:
+            return self._first_stage_search(query, top_k, metadata_filter)
+
+        # Over-fetch candidate cho cross-encoder, chỉ giữ lại top_k
+        candidates = self._first_stage_search(
+            query, max(top_k, SETTINGS.RERANK_CANDIDATES), metadata_filter
+        )
+        return self.reranker.rerank(query, candidates, top_k)
+
+    def _first_stage_search(
+        self,
+        query: str,
+        top_k: int,
+        metadata_filter: Dict[str, Any] | None,
+    ) -> List[Tuple[Document, float]]:
+        if self.bm25 is None:
+            query_embedding = self.embedding_service.embed_query_np(query)
+            return self.search_by_vectors(
+                query_embedding[None, :], top_k=top_k, metadata_filter=metadata_filter
+            )[0]
+        return self._hybrid_search(query, top_k, metadata_filter)
+
+    def _hybrid_search(
+        self,
+        query: str,
+        top_k: int,
+        metadata_filter: Dict[str, Any] | None,
+    ) -> List[Tuple[Document, float]]:
+        deadline = time.monotonic() + SETTINGS.HYBRID_LATENCY_BUDGET_MS / 1000
+        n_candidates = max(top_k, SETTINGS.HYBRID_CANDIDATES)
+
+        # BM25 chạy song song với nhánh dense
+        lexical_future = self._lexical_executor.submit(
+            lambda: self.bm25.get().search(query, top_k=n_candidates)
+        )
+        query_embedding = self.embedding_service.embed_query_np(query)
+        dense = self.search_by_vectors(
+            query_embedding[None, :],
+            top_k=n_candidates,
+            metadata_filter=metadata_filter,
+        )[0]
+
+        # Hết budget thì trả về thứ tự dense thay vì chờ nhánh lexical
+        try:
+            lexical = lexical_future.result(
+                timeout=max(0.0, deadline - time.monotonic())
+            )
+        except FutureTimeoutError:
+            lexical_future.cancel()
+            logger.warning("BM25 search exceeded latency budget, using dense only")
+            return dense[:top_k]
+        except Exception as e:
+            logger.error(f"BM25 search failed, using dense only: {e}")
+            return dense[:top_k]
+
+        docs = {doc.id: doc for doc, _ in dense}
+        missing = [doc_id for doc_id, _ in lexical if doc_id not in docs]
+        for doc in self.get_by_ids(missing):
+            docs[doc.id] = doc
+
+        lexical_ranking = [
+            doc_id
+            for doc_id, _ in lexical
+            if doc_id in docs
+            and (
+                not metadata_filter
+                or match_metadata(docs[doc_id].metadata, metadata_filter)
+            )
+        ]
+        fused = reciprocal_rank_fusion([[doc.id for doc, _ in dense], lexical_ranking])
+        return [(docs[doc_id], score) for doc_id, score in fused[:top_k]]
+
+    def retrieve_vector(
+        self,
+        query: str,
+        top_k: int = 3,
+        with_score: bool = False,
+        metadata_filter: Dict[str, Any] = {},
+    ) -> str:
+        docs_with_scores = self.search(
+            query, top_k=top_k, metadata_filter=metadata_filter
+        )
+
+        if with_score:
+            try:
+                docs, scores = zip(*docs_with_scores)
+                return _format_docs(list(docs), list(scores))
+            except ValueError:
+                return "Không tìm thấy tài liệu phù hợp."
+
+        return _format_docs([doc for doc, _ in docs_with_scores])
+
+    def retrieve_hits(
+        self,
+        query: str,
+        top_k: int = 3,
+        metadata_filter: Dict[str, Any] | None = None,
+    ) -> List[RetrievalHit]:
+        """Giống retrieve_vector nhưng trả về hit có cấu trúc thay vì string"""
+        return [
+            RetrievalHit(
+                id=doc.id,
+                text=doc.page_content,
+                score=score,
+                rank=rank,
+                metadata=doc.metadata,
+            )
+            for rank, (doc, score) in enumerate(
+                self.search(query, top_k=top_k, metadata_filter=metadata_filter)
+            )
+        ]
+
+    def retrieve_with_artifact(
+        self,
+        query: str,
+        top_k: int = 3,
+        with_score: bool = False,
+        metadata_filter: Dict[str, Any] = {},
+    ) -> Tuple[str, List[RetrievalHit]]:
+        """
+        Output cho tool `response_format="content_and_artifact"`: content là
+        string như retrieve_vector (cho LLM), artifact là list RetrievalHit
+        (cho context packer).
+        """
+        hits = self.retrieve_hits(query, top_k=top_k, metadata_filter=metadata_filter)
+        if with_score and not hits:
+            return "Không tìm thấy tài liệu phù hợp.", hits
+
+        docs = [Document(id=hit.id, page_content=hit.text) for hit in hits]
+        scores = [hit.score for hit in hits] if with_score else None
+        return _format_docs(docs, scores), hits
+
+    def retrieve_many(
+        self,
+        queries: List[str],
+        top_k: int = 3,
+        filter: Dict[str, Any] | None = None,
+    ) -> Dict[str, Any]:
+        """
+        Retrieve cho nhiều query cùng lúc: embed tất cả query trong một lần encode
+        và search tất cả vector trong một lần gọi backend (dense-only).
+
+        Returns:
+            {
+                "per_query": List[List[Tuple[Document, float]]],  # theo thứ tự queries
+                "merged": List[Tuple[Document, float]],  # đã loại trùng, sort theo distance
+            }
+        """
+        if not queries:
+            return {"per_query": [], "merged": []}
+
+        query_embeddings = self.embedding_service.embed_documents_np(queries)
+        per_query = self.search_by_vectors(
+            query_embeddings, top_k=top_k, metadata_filter=filter
+        )
+
+        # Gộp kết quả, mỗi chunk chỉ giữ lại distance tốt nhất (nhỏ nhất)
+        best: Dict[str, Tuple[Document, float]] = {}
+        for hits in per_query:
+            for doc, distance in hits:
+                if doc.id not in best or distance < best[doc.id][1]:
+                    best[doc.id] = (doc, distance)
+        merged = sorted(best.values(), key=lambda hit: hit[1])
+
+        return {"per_query": per_query, "merged": merged}
+
+    async def aretrieve_vector(
+        self,
+        query: str,
+        top_k: int = 3,
+        with_score: bool = False,
+        metadata_filter: Dict[str, Any] = {},
+    ) -> str:
+        """Async version của retrieve_vector, chạy trong retrieval pool để không block event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            partial(
+                self.retrieve_vector,
+                query,
+                top_k=top_k,
+                with_score=with_score,
+                metadata_filter=metadata_filter,
+            ),
+        )
+
+    async def aretrieve_with_artifact(
+        self,
+        query: str,
+        top_k: int = 3,
+        with_score: bool = False,
+        metadata_filter: Dict[str, Any] = {},
+    ) -> Tuple[str, List[RetrievalHit]]:
+        """Async version của retrieve_with_artifact, chạy trong retrieval pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            partial(
+                self.retrieve_with_artifact,
+                query,
+                top_k=top_k,
+                with_score=with_score,
+                metadata_filter=metadata_filter,
+            ),
+        )
+
+    async def aretrieve_many(
+        self,
+        queries: List[str],
+        top_k: int = 3,
+        filter: Dict[str, Any] | None = None,
+    ) -> Dict[str, Any]:
+        """Async version của retrieve_many, chạy trong retrieval pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            partial(self.retrieve_many, queries, top_k=top_k, filter=filter),
+        )
@@ -0,0 +1,194 @@
+"""
+Compact BM25 inverted index dùng cho hybrid retrieval.
+
+Index được build từ chính các chunk đã ingest (cùng chunk id với Chroma) và
+persist cạnh dữ liệu Chroma dưới dạng JSON nén gzip:
+
+    {
+        "ids": [...],             # chunk id, cùng thứ tự với doc_lens
+        "doc_lens": [...],        # số token của mỗi chunk
+        "postings": {term: [[doc_idx, tf], ...]},
+    }
+
+Pipeline ingest (ingest_data/plugins/jobs/lexical_index.py) ghi cùng định dạng
+và cùng tokenizer; có thể rebuild từ collection hiện có bằng:
+    python -m src.infrastructure.vector_stores.bm25_index
+"""
+
+import gzip
+import json
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from src.config.settings import SETTINGS
+from src.utils import logger
+
+# Giữ nguyên các token ghép như "460/TB-BTNMT" hoặc "GPT-4" ngoài các phần con
+_TOKEN_RE = re.compile(r"\w+(?:[-./]\w+)*", flags=re.UNICODE)
+_SPLIT_RE = re.compile(r"[-./]")
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokenizer dùng chung cho lúc build index và lúc query (phải giữ đồng bộ với ingest)"""
+    text = unicodedata.normalize("NFC", text).lower()
+    tokens = []
+    for match in _TOKEN_RE.findall(text):
+        tokens.append(match)
+        if _SPLIT_RE.search(match):
+            tokens.extend(part for part in _SPLIT_RE.split(match) if part)
+    return tokens
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids: List[str] = []
+        self.doc_lens = np.zeros(0, dtype=np.float32)
+        self.avgdl = 0.0
+        self._raw_postings: Dict[str, List[List[int]]] = {}
+        # term -> (doc indices, term frequencies, idf)
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray, float]] = {}
+
+    @classmethod
+    def build(cls, ids: List[str], texts: List[str], **kwargs) -> "BM25Index":
+        raw_postings: Dict[str, List[List[int]]] = {}
+        doc_lens = []
+        for doc_idx, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lens.append(sum(counts.values()))
+            for term, tf in counts.items():
+                raw_postings.setdefault(term, []).append([doc_idx, tf])
+
+        index = cls(**kwargs)
+        index._set_data(list(ids), doc_lens, raw_postings)
+        return index
+
+    def _set_data(
+        self,
+        ids: List[str],
+        doc_lens: List[int],
+        raw_postings: Dict[str, List[List[int]]],
+    ):
+        self.ids = ids
+        self.doc_lens = np.asarray(doc_lens, dtype=np.float32)
+        self.avgdl = float(self.doc_lens.mean()) if len(ids) else 0.0
+        self._raw_postings = raw_postings
+
+        n_docs = len(ids)
+        self.postings = {}
+        for term, entries in raw_postings.items():
+            arr = np.asarray(entries, dtype=np.int64)
+            df = len(entries)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            self.postings[term] = (arr[:, 0], arr[:, 1].astype(np.float32), idf)
+
+    def save(self, path: str | Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "ids": self.ids,
+            "doc_lens": self.doc_lens.astype(int).tolist(),
+            "postings": self._raw_postings,
+        }
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str | Path, **kwargs) -> "BM25Index":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            payload = json.load(f)
+        index = cls(**kwargs)
+        index._set_data(payload["ids"], payload["doc_lens"], payload["postings"])
+        return index
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """Trả về (chunk id, BM25 score) sort giảm dần"""
+        if not self.ids:
+            return []
+
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lens / max(self.avgdl, 1e-9))
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            doc_idx, tf, idf = posting
+            scores[doc_idx] += idf * tf * (self.k1 + 1) / (tf + norm[doc_idx])
+
+        n_hits = int(np.count_nonzero(scores))
+        k = min(top_k, n_hits)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[i], float(scores[i])) for i in top]
+
+
+def default_index_path(
+    persist_dir: str = SETTINGS.CHROMA_PERSIST_DIR,
+    collection_name: str = SETTINGS.CHROMA_COLLECTION_NAME,
+) -> Path:
+    """Đường dẫn index mà pipeline ingest ghi ra (plugins/jobs/lexical_index.py)"""
+    return Path(persist_dir) / "bm25" / f"{collection_name}.json.gz"
+
+
+class LazyBM25Index:
+    """Load index từ disk ở lần dùng đầu tiên (hoặc khi warmup)"""
+
+    def __init__(self, path: str = SETTINGS.BM25_INDEX_PATH):
+        self.path = Path(path) if path else default_index_path()
+        self._index: BM25Index | None = None
+        self._lock = threading.Lock()
+
+    def get(self) -> BM25Index:
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = BM25Index.load(self.path)
+                    logger.info(
+                        f"Loaded BM25 index from {self.path}: {len(self._index.ids)} chunks"
+                    )
+        return self._index
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[str]], k: int = SETTINGS.HYBRID_RRF_K
+) -> List[Tuple[str, float]]:
+    """Fuse nhiều ranking (list chunk id, tốt nhất trước) bằng RRF"""
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+def build_from_chroma(
+    persist_dir: str = SETTINGS.CHROMA_PERSIST_DIR,
+    collection_name: str = SETTINGS.CHROMA_COLLECTION_NAME,
+    path: str = SETTINGS.BM25_INDEX_PATH,
+) -> BM25Index:
+    """Rebuild BM25 index từ một Chroma collection có sẵn"""
+    import chromadb
+
+    path = path or default_index_path(persist_dir, collection_name)
+
+    collection = chromadb.PersistentClient(path=str(persist_dir)).get_collection(
+        collection_name
+    )
+    data = collection.get(include=["documents"])
+    index = BM25Index.build(data["ids"], data["documents"])
+    index.save(path)
+    logger.info(f"Built BM25 index for {len(data['ids'])} chunks at {path}")
+    return index
+
+
+if __name__ == "__main__":
+    build_from_chroma()
@@ -1,61 +1,86 @@
+import threading
 from langchain_chroma import Chroma
-from langfuse import observe
-from src.infrastructure.embeddings.embeddings import embedding_service
 from src.config.settings import SETTINGS
+from src.infrastructure.vector_stores.base import BaseVectorStore
 from langchain.schema.document import Document
 from typing import List, Tuple, Dict, Any
+import numpy as np
 
 
-def _format_docs(docs: List[Document], scores: List[float] | None = None) -> str:
-    formatted = []
-    for idx, doc in enumerate(docs):
-        content = doc.page_content.strip()
-        if scores:
-            content += f" [score={scores[idx]:.4f}]"
-        formatted.append(content)
-    return "\n\n".join(formatted)
-
-
-class ChromaClientService:
-    def __init__(self):
+class ChromaClientService(BaseVectorStore):
+    def __init__(self, max_workers: int = SETTINGS.RETRIEVAL_MAX_WORKERS):
+        super().__init__(max_workers=max_workers)
         self.client = None
         self.collection = None
-        self.embedding_service = embedding_service
+        self._connect_lock = threading.Lock()
 
     def _connect(self):
-        persist_dir = SETTINGS.CHROMA_PERSIST_DIR
+        with self._connect_lock:
+            if self.client is not None:
+                return
+
+            persist_dir = SETTINGS.CHROMA_PERSIST_DIR
+
+            self.client = Chroma(
+                collection_name=SETTINGS.CHROMA_COLLECTION_NAME,
+                persist_directory=str(persist_dir),
+                embedding_function=self.embedding_service,
+            )
+
+    def warmup(self):
+        """Mở collection trước khi nhận traffic"""
+        self._connect()
+        self.client._collection.count()
+        super().warmup()
 
-        self.client = Chroma(
-            collection_name=SETTINGS.CHROMA_COLLECTION_NAME,
-            persist_directory=str(persist_dir),
-            embedding_function=self.embedding_service,
+    def get_by_ids(self, ids: List[str]) -> List[Document]:
+        if not ids:
+            return []
+        if self.client is None:
+            self._connect()
+
+        results = self.client._collection.get(
+            ids=ids, include=["documents", "metadatas"]
         )
+        return [
+            Document(id=doc_id, page_content=text, metadata=metadata or {})
+            for doc_id, text, metadata in zip(
+                results["ids"], results["documents"], results["metadatas"]
+            )
+        ]
 
-    def retrieve_vector(
+    def search_by_vectors(
         self,
-        query: str,
+        query_embeddings: np.ndarray,
         top_k: int = 3,
-        with_score: bool = False,
-        metadata_filter: Dict[str, Any] = {},
-    ) -> str:
-
+        metadata_filter: Dict[str, Any] | None = None,
+    ) -> List[List[Tuple[Document, float]]]:
         if self.client is None:
             self._connect()
 
-        if with_score:
-            docs_with_scores: List[Tuple[Document, float]] = (
-                self.client.similarity_search_with_score(
-                    query, k=top_k, filter=metadata_filter
+        # Một Chroma query cho tất cả vector; chromadb 0.4.x chỉ nhận list
+        # nên chỉ convert một lần tại boundary
+        results = self.client._collection.query(
+            query_embeddings=query_embeddings.tolist(),
+            n_results=top_k,
+            where=metadata_filter or None,
+            include=["documents", "metadatas", "distances"],
+        )
+
+        return [
+            [
+                (
+                    Document(id=doc_id, page_content=text, metadata=metadata or {}),
+                    distance,
                 )
+                for doc_id, text, metadata, distance in zip(
+                    ids, documents, metadatas, distances
+                )
+            ]
+            for ids, documents, metadatas, distances in zip(
+                results["ids"],
+                results["documents"],
+                results["metadatas"],
+                results["distances"],
             )
-            try:
-                docs, scores = zip(*docs_with_scores)
-                return _format_docs(list(docs), list(scores))
-            except ValueError:
-                return "Không tìm thấy tài liệu phù hợp."
-
-        else:
-            docs: List[Document] = self.client.similarity_search(
-                query, k=top_k, filter=metadata_filter
-            )
-            return _format_docs(docs)
+        ]
@@ -0,0 +1,186 @@
+"""
+In-process exact-search vector index.
+
+Embeddings được lưu thành một ma trận float32 (`embeddings.npy`) và mở bằng
+`np.load(mmap_mode="r")`, nên nhiều uvicorn worker trên cùng máy dùng chung
+page cache của OS thay vì mỗi worker giữ một bản copy. Search là một phép nhân
+ma trận + `argpartition`, cho kết quả exact (không xấp xỉ như HNSW).
+
+Export từ Chroma collection có sẵn:
+    python -m src.infrastructure.vector_stores.numpy_index
+"""
+
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from langchain.schema.document import Document
+
+from src.config.settings import SETTINGS
+from src.infrastructure.vector_stores.base import BaseVectorStore, match_metadata
+from src.utils import logger
+
+EMBEDDINGS_FILE = "embeddings.npy"
+CHUNKS_FILE = "chunks.json"
+
+
+class NumpyVectorIndex(BaseVectorStore):
+    """
+    Exact-search backend với cùng interface như ChromaClientService.
+
+    Distance trả về là squared L2 (giống space mặc định của Chroma) để
+    score/threshold ở các tầng trên không phụ thuộc backend.
+    """
+
+    def __init__(
+        self,
+        index_dir: str = SETTINGS.NUMPY_INDEX_DIR,
+        max_workers: int = SETTINGS.RETRIEVAL_MAX_WORKERS,
+    ):
+        super().__init__(max_workers=max_workers)
+        self.index_dir = Path(index_dir)
+        self.embeddings: np.ndarray | None = None
+        self.squared_norms: np.ndarray | None = None
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.id_to_index: Dict[str, int] = {}
+        self._load_lock = threading.Lock()
+
+    def _load(self):
+        with self._load_lock:
+            if self.embeddings is not None:
+                return
+
+            # mmap read-only: các worker chia sẻ cùng page cache
+            embeddings = np.load(self.index_dir / EMBEDDINGS_FILE, mmap_mode="r")
+            with open(self.index_dir / CHUNKS_FILE, encoding="utf-8") as f:
+                chunks = json.load(f)
+
+            self.ids = chunks["ids"]
+            self.documents = chunks["documents"]
+            self.metadatas = [m or {} for m in chunks["metadatas"]]
+            self.id_to_index = {doc_id: i for i, doc_id in enumerate(self.ids)}
+            self.squared_norms = np.einsum("ij,ij->i", embeddings, embeddings)
+            self.embeddings = embeddings
+            logger.info(
+                f"Loaded NumpyVectorIndex from {self.index_dir}: "
+                f"{embeddings.shape[0]} chunks, dim={embeddings.shape[1]}"
+            )
+
+    def warmup(self):
+        self._load()
+        super().warmup()
+
+    def _document(self, i: int) -> Document:
+        return Document(
+            id=self.ids[i], page_content=self.documents[i], metadata=self.metadatas[i]
+        )
+
+    def get_by_ids(self, ids: List[str]) -> List[Document]:
+        if self.embeddings is None:
+            self._load()
+        return [
+            self._document(self.id_to_index[i]) for i in ids if i in self.id_to_index
+        ]
+
+    def _filter_mask(self, metadata_filter: Dict[str, Any] | None) -> np.ndarray | None:
+        if not metadata_filter:
+            return None
+        return np.fromiter(
+            (match_metadata(m, metadata_filter) for m in self.metadatas),
+            dtype=bool,
+            count=len(self.metadatas),
+        )
+
+    def search_by_vectors(
+        self,
+        query_embeddings: np.ndarray,
+        top_k: int = 3,
+        metadata_filter: Dict[str, Any] | None = None,
+    ) -> List[List[Tuple[Document, float]]]:
+        if self.embeddings is None:
+            self._load()
+
+        queries = np.ascontiguousarray(query_embeddings, dtype=np.float32)
+        # ||q - x||^2 = ||q||^2 + ||x||^2 - 2 q.x, tính cho tất cả query một lần
+        distances = (
+            np.einsum("ij,ij->i", queries, queries)[:, None]
+            + self.squared_norms[None, :]
+            - 2.0 * (queries @ self.embeddings.T)
+        )
+
+        mask = self._filter_mask(metadata_filter)
+        if mask is not None:
+            distances[:, ~mask] = np.inf
+
+        n_candidates = int(mask.sum()) if mask is not None else distances.shape[1]
+        k = min(top_k, n_candidates)
+        if k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        results = []
+        for row in distances:
+            top = np.argpartition(row, k - 1)[:k]
+            top = top[np.argsort(row[top])]
+            results.append([(self._document(i), float(max(row[i], 0.0))) for i in top])
+        return results
+
+
+def export_from_chroma(
+    persist_dir: str = SETTINGS.CHROMA_PERSIST_DIR,
+    collection_name: str = SETTINGS.CHROMA_COLLECTION_NAME,
+    index_dir: str = SETTINGS.NUMPY_INDEX_DIR,
+    batch_size: int = 1000,
+) -> Path:
+    """Export một Chroma collection có sẵn sang định dạng của NumpyVectorIndex"""
+    import chromadb
+
+    collection = chromadb.PersistentClient(path=str(persist_dir)).get_collection(
+        collection_name
+    )
+    total = collection.count()
+    if total == 0:
+        raise ValueError(f"Collection {collection_name} is empty")
+
+    out_dir = Path(index_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    embeddings = None
+    ids, documents, metadatas = [], [], []
+    for offset in range(0, total, batch_size):
+        batch = collection.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=batch_size,
+            offset=offset,
+        )
+        vectors = np.asarray(batch["embeddings"], dtype=np.float32)
+        if embeddings is None:
+            # Ghi thẳng ra file .npy qua memmap, không giữ cả ma trận trong RAM
+            embeddings = np.lib.format.open_memmap(
+                out_dir / EMBEDDINGS_FILE,
+                mode="w+",
+                dtype=np.float32,
+                shape=(total, vectors.shape[1]),
+            )
+        embeddings[offset : offset + len(vectors)] = vectors
+        ids.extend(batch["ids"])
+        documents.extend(batch["documents"])
+        metadatas.extend(batch["metadatas"])
+
+    embeddings.flush()
+    with open(out_dir / CHUNKS_FILE, "w", encoding="utf-8") as f:
+        json.dump(
+            {"ids": ids, "documents": documents, "metadatas": metadatas},
+            f,
+            ensure_ascii=False,
+        )
+
+    logger.info(f"Exported {total} chunks from {collection_name} to {out_dir}")
+    return out_dir
+
+
+if __name__ == "__main__":
+    export_from_chroma()
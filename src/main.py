@@ -1,10 +1,14 @@
+import asyncio
 import logging
 import tracemalloc
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 import os
-from fastapi import FastAPI
+from fastapi import FastAPI, status
+from fastapi.responses import JSONResponse
 from src.api.routers.api import api_router
-from src.services.application.rag import rag_service
+from src.services.application.cache_warmer import CacheWarmer
+from src.services.application.rag import get_rag_service
+from src.utils import logger
 from src.config.settings import APP_CONFIGS, SETTINGS
 from nemoguardrails import LLMRails, RailsConfig
 
@@ -24,22 +28,56 @@ class EndpointFilter(logging.Filter):
 logging.getLogger("uvicorn.access").addFilter(EndpointFilter())
 
 
+def _build_guardrails(path: str) -> LLMRails:
+    return LLMRails(RailsConfig.from_path(path))
+
+
+async def warmup(app: FastAPI):
+    """Warm-up toàn bộ service nặng song song; app chỉ ready sau khi xong"""
+    rag_service = app.state.rag_service
+    try:
+        rails_restapi, rails_sse, _ = await asyncio.gather(
+            # --- REST API Guardrails Setup ---
+            asyncio.to_thread(_build_guardrails, "guardrails/config_restapi"),
+            # --- SSE Guardrails Setup ---
+            asyncio.to_thread(_build_guardrails, "guardrails/config_sse"),
+            rag_service.warmup(),
+        )
+        app.state.rails_restapi = rails_restapi
+        app.state.rails_sse = rails_sse
+        app.state.ready = True
+        logger.info("Warm-up completed, service is ready")
+    except Exception as e:
+        logger.error(f"Warm-up failed: {e}")
+        raise
+
+    # Warm cache sau khi đã ready: traffic thật không phải chờ, replay bị giới hạn rate
+    if SETTINGS.CACHE_WARMUP_FILE:
+        try:
+            await CacheWarmer(rag_service, guardrails=rails_restapi).run_file(
+                SETTINGS.CACHE_WARMUP_FILE
+            )
+        except Exception as e:
+            logger.error(f"Cache warm-up failed: {e}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    app.state.rag_service = rag_service
+    app.state.ready = False
+    app.state.rails_restapi = None
+    app.state.rails_sse = None
+    app.state.rag_service = get_rag_service()
 
-    # --- REST API Guardrails Setup ---
-    config_restapi = RailsConfig.from_path("guardrails/config_restapi")
-    rails_restapi = LLMRails(config_restapi)
-    app.state.rails_restapi = rails_restapi
-
-    # --- SSE Guardrails Setup ---
-    config_sse = RailsConfig.from_path("guardrails/config_sse")
-    rails_sse = LLMRails(config_sse)
-    app.state.rails_sse = rails_sse
+    # Warm-up chạy nền để worker boot nhanh; /ready báo 503 cho tới khi xong
+    warmup_task = asyncio.create_task(warmup(app))
 
     yield
 
+    warmup_task.cancel()
+    with suppress(asyncio.CancelledError, Exception):
+        await warmup_task
+    await app.state.rag_service.shutdown()
+
 
 app = FastAPI(**APP_CONFIGS, lifespan=lifespan)
 
@@ -50,10 +88,20 @@ async def healthcheck() -> dict[str, str]:
 
 
 @app.get("/ready", include_in_schema=False)
-async def readycheck() -> dict[str, str]:
+async def readycheck():
+    if not app.state.ready:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "warming_up"},
+        )
     return {"status": "ok"}
 
 
+@app.get("/stats", include_in_schema=False)
+async def statscheck():
+    return await app.state.rag_service.stats()
+
+
 app.include_router(
     api_router,
     prefix=SETTINGS.API_V1_STR,
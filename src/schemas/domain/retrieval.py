@@ -14,3 +14,11 @@ class SearchArgs(BaseModel):
         description="Whether to return the score of the results",
         default=False,
     )
+
+
+class RetrievalHit(BaseModel):
+    id: str = Field(description="Chunk id trong vector store")
+    text: str = Field(description="Nội dung chunk")
+    score: float = Field(description="Score của retrieval stage cuối cùng")
+    rank: int = Field(description="Vị trí trong kết quả của query, 0 là tốt nhất")
+    metadata: dict = Field(default_factory=dict)
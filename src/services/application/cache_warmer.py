@@ -0,0 +1,217 @@
+"""
+Warm semantic cache từ query log / replay file (jsonl).
+
+Mỗi dòng là một JSON object, câu hỏi lấy từ field đầu tiên có giá trị trong
+`QUESTION_FIELDS` (format của API là `user_input`, replay file ở repo root dùng
+`body`); dòng là JSON string cũng được chấp nhận. Câu hỏi trùng (sau khi chuẩn
+hoá) chỉ replay một lần, câu đã có entry pre-cache trên Redis thì bỏ qua.
+
+Chạy tay sau deploy hoặc sau khi flush Redis:
+    python -m src.services.application.cache_warmer requests.jsonl \\
+        --concurrency 4 --rate 2 --guardrails guardrails/config_restapi
+
+Hoặc set CACHE_WARMUP_FILE để app tự warm sau khi warm-up xong.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List
+
+from nemoguardrails import LLMRails
+
+from src.cache.semantic_cache import semantic_cache_llms
+from src.cache.single_flight import make_key
+from src.config.settings import SETTINGS
+from src.services.application.rag import Rag, get_rag_service
+from src.utils import logger
+
+QUESTION_FIELDS = ("question", "user_input", "query", "body")
+PRE_CACHE_NAMESPACE = "pre-cache"
+
+
+def load_questions(
+    path: str | Path, limit: int = SETTINGS.CACHE_WARMUP_LIMIT
+) -> List[str]:
+    """Đọc câu hỏi từ file jsonl, bỏ dòng lỗi và câu trùng, giữ thứ tự xuất hiện"""
+    questions: List[str] = []
+    seen = set()
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Skip invalid JSON at {path}:{line_no}")
+                continue
+
+            if isinstance(record, str):
+                question = record
+            elif isinstance(record, dict):
+                question = next(
+                    (record[k] for k in QUESTION_FIELDS if record.get(k)), None
+                )
+            else:
+                question = None
+            if not isinstance(question, str) or not question.strip():
+                continue
+
+            key = make_key(PRE_CACHE_NAMESPACE, question)
+            if key in seen:
+                continue
+            seen.add(key)
+            questions.append(question.strip())
+            if limit and len(questions) >= limit:
+                break
+    return questions
+
+
+class RateLimiter:
+    """Giãn cách các lần gọi để không vượt `rate_per_sec` (0 = không giới hạn)"""
+
+    def __init__(self, rate_per_sec: float):
+        self.interval = 1.0 / rate_per_sec if rate_per_sec > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class CacheWarmer:
+    """
+    Replay câu hỏi qua `Rag.get_response` để điền pre-cache và post-cache.
+
+    Mỗi câu hỏi chạy với session riêng (history rỗng) để response không phụ
+    thuộc hội thoại khác; session được xoá sau khi replay.
+    """
+
+    def __init__(
+        self,
+        rag_service: Rag,
+        guardrails: LLMRails | None = None,
+        concurrency: int = SETTINGS.CACHE_WARMUP_CONCURRENCY,
+        rate_per_sec: float = SETTINGS.CACHE_WARMUP_RATE_PER_SEC,
+    ):
+        self.rag_service = rag_service
+        self.guardrails = guardrails
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.rate_limiter = RateLimiter(rate_per_sec)
+        self._stats = {"skipped": 0, "replayed": 0, "failed": 0}
+
+    async def _is_cached(self, question: str) -> bool:
+        try:
+            return await semantic_cache_llms.contains(PRE_CACHE_NAMESPACE, question)
+        except Exception as e:
+            logger.warning(f"Cache lookup failed during warm-up: {e}")
+            return False
+
+    async def _warm_one(self, question: str):
+        async with self.semaphore:
+            if await self._is_cached(question):
+                self._stats["skipped"] += 1
+                return
+
+            await self.rate_limiter.acquire()
+            session_id = f"cache-warmup-{uuid.uuid4().hex}"
+            try:
+                response = await self.rag_service.get_response(
+                    question=question,
+                    session_id=session_id,
+                    user_id="cache-warmer",
+                    guardrails=self.guardrails,
+                )
+                self._stats["replayed" if response else "failed"] += 1
+            except Exception as e:
+                self._stats["failed"] += 1
+                logger.warning(f"Warm-up failed for {question!r}: {e}")
+            finally:
+                await self.rag_service.session_store.delete(session_id)
+
+    async def _hit_rate(self, questions: List[str]) -> float:
+        hits = 0
+        for question in questions:
+            hits += await self._is_cached(question)
+        return hits / len(questions) if questions else 0.0
+
+    async def run(self, questions: List[str]) -> Dict[str, Any]:
+        """Warm toàn bộ câu hỏi, trả về report gồm hit rate trước và sau khi warm"""
+        started = time.perf_counter()
+        hit_rate_before = await self._hit_rate(questions)
+
+        await asyncio.gather(*(self._warm_one(q) for q in questions))
+        # Cache update chạy write-behind, chờ ghi xong rồi mới đo lại.
+        # Không dùng flush(): nó dừng worker và đóng pool của traffic đang chạy
+        await semantic_cache_llms.drain()
+
+        report = {
+            "questions": len(questions),
+            **self._stats,
+            "hit_rate_before": hit_rate_before,
+            "hit_rate_after": await self._hit_rate(questions),
+            "duration_s": round(time.perf_counter() - started, 2),
+        }
+        logger.info(f"Cache warm-up report: {report}")
+        return report
+
+    async def run_file(
+        self, path: str | Path, limit: int = SETTINGS.CACHE_WARMUP_LIMIT
+    ) -> Dict[str, Any]:
+        return await self.run(load_questions(path, limit=limit))
+
+
+async def _main(args: argparse.Namespace):
+    rag_service = get_rag_service()
+    await rag_service.warmup()
+    guardrails = None
+    if args.guardrails:
+        from nemoguardrails import RailsConfig
+
+        guardrails = LLMRails(RailsConfig.from_path(args.guardrails))
+
+    warmer = CacheWarmer(
+        rag_service,
+        guardrails=guardrails,
+        concurrency=args.concurrency,
+        rate_per_sec=args.rate,
+    )
+    try:
+        report = await warmer.run_file(args.path, limit=args.limit)
+    finally:
+        await rag_service.shutdown()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Warm semantic cache from a jsonl file"
+    )
+    parser.add_argument("path", nargs="?", default=SETTINGS.CACHE_WARMUP_FILE)
+    parser.add_argument(
+        "--concurrency", type=int, default=SETTINGS.CACHE_WARMUP_CONCURRENCY
+    )
+    parser.add_argument(
+        "--rate", type=float, default=SETTINGS.CACHE_WARMUP_RATE_PER_SEC
+    )
+    parser.add_argument("--limit", type=int, default=SETTINGS.CACHE_WARMUP_LIMIT)
+    parser.add_argument(
+        "--guardrails",
+        default="",
+        help="Guardrails config dir, vd: guardrails/config_restapi",
+    )
+    args = parser.parse_args()
+    if not args.path:
+        parser.error("path is required (or set CACHE_WARMUP_FILE)")
+    asyncio.run(_main(args))
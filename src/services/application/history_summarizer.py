@@ -0,0 +1,130 @@
+"""
+Tóm tắt chat history ở background, ngoài response path.
+
+Sau mỗi lượt hội thoại, Rag gọi `schedule(session_id)` rồi trả response ngay.
+Worker gộp các lượt mới (phần chưa tóm tắt, trừ `keep_last` message gần nhất)
+vào rolling summary ở đầu history khi phần đó vượt `trigger_tokens`. Mỗi session
+chỉ có tối đa một task chạy; các lần schedule trong lúc task đang chạy được gộp
+thành một lượt chạy lại sau đó. Request tiếp theo dùng summary nào đã sẵn sàng
+tại thời điểm đọc history.
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from src.config.settings import SETTINGS
+from src.infrastructure.session_stores.base import SessionStore
+from src.services.domain.summarize import SummarizeService
+from src.utils import logger
+from src.utils.tokenizer import count_tokens
+
+SUMMARY_PREFIX = "Previous conversation summary: "
+
+
+def is_summary(message: Dict[str, Any]) -> bool:
+    return message.get("role") == "system" and str(
+        message.get("content", "")
+    ).startswith(SUMMARY_PREFIX)
+
+
+class HistorySummarizer:
+    def __init__(
+        self,
+        session_store: SessionStore,
+        summarize_service: SummarizeService,
+        trigger_tokens: int = SETTINGS.SUMMARY_TRIGGER_TOKENS,
+        keep_last: int = SETTINGS.SUMMARY_KEEP_LAST,
+        max_concurrency: int = SETTINGS.SUMMARY_MAX_CONCURRENCY,
+    ):
+        self.session_store = session_store
+        self.summarize_service = summarize_service
+        self.trigger_tokens = trigger_tokens
+        self.keep_last = keep_last
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        # session_id -> task đang chạy; session trong _dirty cần chạy thêm một lượt
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._dirty: set = set()
+        self._user_ids: Dict[str, Optional[str]] = {}
+        self._stats = {
+            "scheduled": 0,
+            "coalesced": 0,
+            "summarized": 0,
+            "skipped": 0,
+            "failed": 0,
+        }
+
+    def schedule(self, session_id: Optional[str], user_id: Optional[str] = None):
+        """Không block: tạo task cho session, hoặc đánh dấu chạy lại nếu task đang chạy"""
+        if not session_id:
+            return
+        self._stats["scheduled"] += 1
+        self._user_ids[session_id] = user_id
+        if session_id in self._tasks:
+            self._dirty.add(session_id)
+            self._stats["coalesced"] += 1
+            return
+        self._tasks[session_id] = asyncio.create_task(self._run(session_id))
+
+    async def _run(self, session_id: str):
+        try:
+            while True:
+                self._dirty.discard(session_id)
+                async with self._semaphore:
+                    await self._summarize(session_id)
+                if session_id not in self._dirty:
+                    return
+        except Exception as e:
+            self._stats["failed"] += 1
+            logger.error(f"Background summarization failed for {session_id}: {e}")
+        finally:
+            # Không có await từ lần check _dirty tới đây nên không mất lần schedule nào
+            self._tasks.pop(session_id, None)
+            self._user_ids.pop(session_id, None)
+
+    async def _summarize(self, session_id: str):
+        history = await self.session_store.get(session_id)
+        has_summary = bool(history) and is_summary(history[0])
+        start = 1 if has_summary else 0
+        end = len(history) - self.keep_last
+        new_messages = history[start:end]
+        if not new_messages:
+            return
+
+        # Chỉ đếm phần sẽ được gộp vào summary (không tính keep_last);
+        # tokenizer chạy ngoài event loop
+        pending_tokens = await asyncio.to_thread(self._count_tokens, new_messages)
+        if pending_tokens < self.trigger_tokens:
+            return
+
+        previous_summary = (
+            history[0]["content"][len(SUMMARY_PREFIX) :] if has_summary else None
+        )
+        summary = await self.summarize_service.summarize_incremental(
+            previous_summary,
+            new_messages,
+            session_id=session_id,
+            user_id=self._user_ids.get(session_id),
+        )
+        compacted = await self.session_store.compact(
+            session_id,
+            {"role": "system", "content": f"{SUMMARY_PREFIX}{summary}"},
+            consumed=end,
+            expected_head=history[0],
+        )
+        self._stats["summarized" if compacted else "skipped"] += 1
+
+    @staticmethod
+    def _count_tokens(messages: List[Dict[str, Any]]) -> int:
+        return sum(count_tokens(str(m.get("content", ""))) for m in messages)
+
+    async def close(self, timeout: float = 5.0):
+        """Chờ các task đang chạy (dùng khi shutdown), quá timeout thì huỷ"""
+        tasks = list(self._tasks.values())
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "running": len(self._tasks)}
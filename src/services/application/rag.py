@@ -1,10 +1,21 @@
+import asyncio
+from functools import lru_cache
+from src.cache.redis_health import redis_health
 from src.cache.semantic_cache import semantic_cache_llms
+from src.cache.standard_cache import standard_cache
+from src.infrastructure.embeddings.embeddings import embedding_service
 from src.services.domain.generator import RestApiGeneratorService, SSEGeneratorService
 from src.services.domain.summarize import SummarizeService
+from src.services.application.history_summarizer import HistorySummarizer
 from langchain.tools import StructuredTool
 from langchain_openai import ChatOpenAI
 from src.config.settings import SETTINGS
+from src.infrastructure.vector_stores.base import BaseVectorStore
 from src.infrastructure.vector_stores.chroma_client import ChromaClientService
+from src.infrastructure.vector_stores.numpy_index import NumpyVectorIndex
+from src.infrastructure.session_stores.base import SessionStore
+from src.infrastructure.session_stores.in_memory import InMemorySessionStore
+from src.infrastructure.session_stores.redis_store import RedisSessionStore
 from src.schemas.domain.retrieval import SearchArgs
 
 from langfuse import observe
@@ -14,17 +25,18 @@ import uuid
 from nemoguardrails import LLMRails
 import json
 from src.utils.text_processing import is_guardrails_error
+from src.utils.tokenizer import get_tokenizer
 
 
 class Rag:
     def __init__(self):
         self.llm = ChatOpenAI(**SETTINGS.llm_config)
-        self.chroma_client = ChromaClientService()
+        self.vector_store = self._build_vector_store(SETTINGS.VECTOR_STORE_BACKEND)
         self.langfuse_handler = CallbackHandler()
         self.langfuse = get_client()
 
-        # In-memory storage cho session history
-        self.session_histories: dict[str, list[dict]] = {}
+        # Session history: in-memory (LRU + TTL) hoặc Redis (dùng chung giữa các worker)
+        self.session_store = self._build_session_store(SETTINGS.SESSION_STORE_BACKEND)
 
         # Define search tool
         self.search_tool = StructuredTool.from_function(
@@ -37,8 +49,11 @@ class Rag:
                 "    with_score (bool): whether to include similarity scores.\n"
                 "    metadata_filter (dict): filter by metadata.\n"
             ),
-            func=self.chroma_client.retrieve_vector,
+            func=self.vector_store.retrieve_with_artifact,
+            coroutine=self.vector_store.aretrieve_with_artifact,
             args_schema=SearchArgs,
+            # ToolMessage mang theo list RetrievalHit để build_context dedupe/pack
+            response_format="content_and_artifact",
         )
 
         # Define tools dictionary
@@ -62,25 +77,79 @@ class Rag:
         self.summarize_service = SummarizeService(
             langfuse_handler=self.langfuse_handler,
         )
+        # Tóm tắt history ở background, request không chờ LLM summary
+        self.history_summarizer = HistorySummarizer(
+            session_store=self.session_store,
+            summarize_service=self.summarize_service,
+        )
+
+    @staticmethod
+    def _build_vector_store(backend: str) -> BaseVectorStore:
+        if backend == "chroma":
+            return ChromaClientService()
+        if backend == "numpy":
+            return NumpyVectorIndex()
+        raise ValueError(f"Unknown vector store backend: {backend}")
+
+    @staticmethod
+    def _build_session_store(backend: str) -> SessionStore:
+        if backend == "memory":
+            return InMemorySessionStore()
+        if backend == "redis":
+            return RedisSessionStore()
+        raise ValueError(f"Unknown session store backend: {backend}")
+
+    async def warmup(self):
+        """Warm-up song song model, Chroma collection, Redis và prompts trước khi nhận traffic"""
+        await asyncio.gather(
+            asyncio.to_thread(embedding_service.warmup),
+            asyncio.to_thread(self.vector_store.warmup),
+            semantic_cache_llms.warmup(),
+            standard_cache.warmup(),
+            asyncio.to_thread(self.rest_generator_service.load_prompts),
+            asyncio.to_thread(self.sse_generator_service.load_prompts),
+            asyncio.to_thread(get_tokenizer),
+        )
+
+    async def stats(self) -> dict:
+        return {
+            "embedding": embedding_service.stats(),
+            "retrieval": self.vector_store.stats(),
+            "semantic_cache": semantic_cache_llms.stats(),
+            "semantic_cache_storage": await semantic_cache_llms.storage_stats(),
+            "standard_cache": standard_cache.stats(),
+            "redis": redis_health.stats(),
+            "session_store": self.session_store.stats(),
+            "history_summarizer": self.history_summarizer.stats(),
+        }
+
+    async def shutdown(self):
+        """Ghi nốt các cache update còn trong queue trước khi tắt"""
+        await semantic_cache_llms.flush()
+        await self.history_summarizer.close()
+        await self.session_store.close()
 
-    def _get_session_history(self, session_id: str | None = None) -> list[dict]:
-        """Lấy chat history từ in-memory storage"""
+    async def _get_session_history(self, session_id: str | None = None) -> list[dict]:
+        """Lấy chat history từ session store"""
         if not session_id:
             return []
 
-        return self.session_histories.get(session_id, [])
+        return await self.session_store.get(session_id)
 
-    def _save_to_session_history(self, session_id: str, question: str, response: str):
-        """Lưu vào in-memory storage"""
-        if session_id not in self.session_histories:
-            self.session_histories[session_id] = []
+    async def _save_to_session_history(
+        self, session_id: str | None, question: str, response: str
+    ):
+        """Lưu vào session store"""
+        if not session_id:
+            return
 
         # Add user message và assistant response
-        self.session_histories[session_id].extend(
+        await self.session_store.append(
+            session_id,
             [
                 {"role": "user", "content": question},
                 {"role": "assistant", "content": response},
-            ]
+            ],
         )
 
     @semantic_cache_llms.cache(namespace="pre-cache")
@@ -92,7 +161,7 @@ class Rag:
         user_id: str | None = None,
         guardrails: LLMRails | None = None,
     ):
-        chat_history = self._get_session_history(session_id)
+        chat_history = await self._get_session_history(session_id)
 
         # ———— Nếu có Guardrails thì dùng nó ————
         if guardrails:
@@ -111,21 +180,13 @@ class Rag:
                 return blocked_response
 
             # Không cần lưu history nếu Guardrails block ; Nếu guardrails ok thì lưu
-            self._save_to_session_history(session_id, question, str(result))
-            # Kiểm tra và tóm tắt lịch sử nếu cần (chạy sau khi response xong)
-            current_history = self._get_session_history(session_id)
-            if len(current_history) >= 4:
-                summarized_history = (
-                    await self.summarize_service._summarize_and_truncate_history(
-                        chat_history=current_history, keep_last=2
-                    )
-                )
-                self.session_histories[session_id] = summarized_history
+            await self._save_to_session_history(session_id, question, str(result))
+            self.history_summarizer.schedule(session_id, user_id)
             return str(result)
 
         # ———— Fallback: chạy RAG thường ————
 
-        rag_output = await self.rest_generator_service.generate(
+        rag_output = await self.rest_generator_service.generate_rest_api(
             question=question,
             chat_history=chat_history,
             session_id=session_id,
@@ -133,16 +194,8 @@ class Rag:
         )
 
         # lưu lại history sau khi RAG trả về
-        self._save_to_session_history(session_id, question, rag_output)
-        # Kiểm tra và tóm tắt lịch sử nếu cần (chạy sau khi response xong)
-        current_history = self._get_session_history(session_id)
-        if len(current_history) >= 4:
-            summarized_history = (
-                await self.summarize_service._summarize_and_truncate_history(
-                    chat_history=current_history, keep_last=2
-                )
-            )
-            self.session_histories[session_id] = summarized_history
+        await self._save_to_session_history(session_id, question, rag_output)
+        self.history_summarizer.schedule(session_id, user_id)
         return rag_output
 
     # ----------------------------------------------SSE----------------------------------------------
@@ -159,7 +212,7 @@ class Rag:
             input={"question": question, "session_id": session_id, "user_id": user_id},
         ) as span:
             self.langfuse.update_current_trace(session_id=session_id, user_id=user_id)
-            chat_history = self._get_session_history(session_id)
+            chat_history = await self._get_session_history(session_id)
 
             # Tạo async generator cho external LLM streaming
             @observe()
@@ -206,15 +259,11 @@ class Rag:
 
                 # Only save to history if not blocked
                 if not is_blocked:
-                    self._save_to_session_history(session_id, question, full_response)
+                    await self._save_to_session_history(
+                        session_id, question, full_response
+                    )
                     span.update(output=full_response)
-                    # Kiểm tra và tóm tắt lịch sử nếu cần (chạy sau khi response xong)
-                    current_history = self._get_session_history(session_id)
-                    if len(current_history) >= 4:
-                        summarized_history = await self.summarize_service._summarize_and_truncate_history(
-                            chat_history=current_history, keep_last=2
-                        )
-                        self.session_histories[session_id] = summarized_history
+                    self.history_summarizer.schedule(session_id, user_id)
                 else:
                     span.update(output="Request blocked by guardrails")
                 return
@@ -228,17 +277,12 @@ class Rag:
                 yield f"{json.dumps(message)}\n\n"
 
             # Save conversation sau khi stream xong
-            self._save_to_session_history(session_id, question, full_response)
+            await self._save_to_session_history(session_id, question, full_response)
             span.update(output=full_response)
-            # Kiểm tra và tóm tắt lịch sử nếu cần (chạy sau khi response xong)
-            current_history = self._get_session_history(session_id)
-            if len(current_history) >= 4:
-                summarized_history = (
-                    await self.summarize_service._summarize_and_truncate_history(
-                        chat_history=current_history, keep_last=2
-                    )
-                )
-                self.session_histories[session_id] = summarized_history
+            self.history_summarizer.schedule(session_id, user_id)
 
 
-rag_service = Rag()
+@lru_cache(maxsize=None)
+def get_rag_service() -> Rag:
+    """Khởi tạo Rag lazily (một instance mỗi process)"""
+    return Rag()
@@ -4,13 +4,49 @@ from langchain_core.messages import BaseMessage
 from langchain_core.language_models.base import LanguageModelInput
 from langchain_core.messages import ToolMessage
 from src.utils import logger
+from src.config.settings import SETTINGS
+import asyncio
+import hashlib
 import json
 import re
+import unicodedata
 from langfuse.langchain import CallbackHandler
 from langfuse import get_client
 from abc import ABC, abstractmethod
 
 
+def rag_post_cache_key(
+    service: "BaseGeneratorService", *args, messages: list, question: str, **kwargs
+) -> str:
+    """
+    Exact key cho post-cache: hash(question đã chuẩn hoá, chunk id đã sort,
+    version của prompt_rag). Không cần build/embed context.
+    """
+    chunk_ids = set()
+    other_outputs = []
+    for m in messages:
+        if isinstance(m, ToolMessage):
+            if m.artifact:
+                chunk_ids.update(hit.id for hit in m.artifact)
+            else:
+                # Tool không có artifact (vd: lỗi) thì key theo content
+                other_outputs.append(str(m.content))
+
+    normalized_question = " ".join(
+        unicodedata.normalize("NFC", question).split()
+    ).casefold()
+    payload = json.dumps(
+        [
+            normalized_question,
+            sorted(chunk_ids),
+            service.prompt_rag.version,
+            other_outputs,
+        ],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
 class BaseGeneratorService(ABC):
     """Base class for REST API and SSE"""
 
@@ -23,18 +59,36 @@ class BaseGeneratorService(ABC):
         self.llm_with_tools = llm_with_tools
         self.tools = tools
         self.langfuse = get_client()
-        self.prompt_userinput = self.langfuse.get_prompt(
+        # Prompts được fetch từ Langfuse khi warmup (hoặc lần dùng đầu tiên)
+        self._prompt_userinput = None
+        self._prompt_rag = None
+        self.clear_think = re.compile(r"<think>.*?</think>", flags=re.DOTALL)
+        self.langfuse_handler = langfuse_handler
+
+    def load_prompts(self):
+        """Fetch production prompts từ Langfuse"""
+        self._prompt_userinput = self.langfuse.get_prompt(
             "userinput_service",
             label="production",
             type="text",
         )
-        self.prompt_rag = self.langfuse.get_prompt(
+        self._prompt_rag = self.langfuse.get_prompt(
             "rag_service",
             label="production",
             type="text",
         )
-        self.clear_think = re.compile(r"<think>.*?</think>", flags=re.DOTALL)
-        self.langfuse_handler = langfuse_handler
+
+    @property
+    def prompt_userinput(self):
+        if self._prompt_userinput is None:
+            self.load_prompts()
+        return self._prompt_userinput
+
+    @property
+    def prompt_rag(self):
+        if self._prompt_rag is None:
+            self.load_prompts()
+        return self._prompt_rag
 
     def _update_trace_context(
         self, session_id: str | None = None, user_id: str | None = None
@@ -74,39 +128,79 @@ class BaseGeneratorService(ABC):
     ):
         self._update_trace_context(session_id, user_id)
 
-        executed_tools = []
+        # Trải phẳng tất cả lệnh gọi tool theo đúng thứ tự LLM trả về
+        # (name, tool_inst, args, tool_call_id, span_name)
+        calls = []
         for tool_call in tool_calls:
             name = tool_call["function"]["name"].lower()
-            if name not in self.tools:
-                raise ValueError(f"Unknown tool: {name}")
-
-            tool_inst = self.tools[name]
-            payload = json.loads(tool_call["function"]["arguments"])
-
-            with self.langfuse.start_as_current_span(
-                name=f"tool_{name}", input=payload, metadata={"tool_name": name}
-            ) as span:
-
-                if "tool_calls" in payload:
-                    for call_args in payload["tool_calls"]:
-                        # Trace từng call args nếu có nhiều
-                        with self.langfuse.start_as_current_span(
-                            name=f"tool_{name}_call", input=call_args
-                        ) as sub_span:
-                            output = tool_inst.invoke(call_args)
-                            sub_span.update(output=output)
-
-                        messages.append(
-                            ToolMessage(
-                                content=output, tool_call_id=tool_call.get("id")
-                            )
+            try:
+                if name not in self.tools:
+                    raise ValueError(f"Unknown tool: {name}")
+                tool_inst = self.tools[name]
+                payload = json.loads(tool_call["function"]["arguments"])
+            except (ValueError, TypeError) as e:
+                # Giữ lỗi lại để trả về ToolMessage lỗi, không bỏ các call khác
+                calls.append((name, None, e, tool_call.get("id"), f"tool_{name}"))
+                continue
+
+            if "tool_calls" in payload:
+                for call_args in payload["tool_calls"]:
+                    calls.append(
+                        (
+                            name,
+                            tool_inst,
+                            call_args,
+                            tool_call.get("id"),
+                            f"tool_{name}_call",
                         )
-                else:
-                    output = tool_inst.invoke(payload)
-                    span.update(output=output)
-                    messages.append(
-                        ToolMessage(content=output, tool_call_id=tool_call.get("id"))
                     )
+            else:
+                calls.append(
+                    (name, tool_inst, payload, tool_call.get("id"), f"tool_{name}")
+                )
+
+        # Chạy song song các tool call độc lập, giới hạn số call đồng thời mỗi request
+        semaphore = asyncio.Semaphore(SETTINGS.TOOL_MAX_CONCURRENCY)
+
+        async def _run(name, tool_inst, args, tool_call_id, span_name):
+            if tool_inst is None:
+                # Call không parse được (tool lạ, arguments không phải JSON)
+                raise args
+            async with semaphore:
+                with self.langfuse.start_as_current_span(
+                    name=span_name, input=args, metadata={"tool_name": name}
+                ) as span:
+                    # Invoke bằng ToolCall để nhận ToolMessage (kèm artifact nếu có)
+                    output = await tool_inst.ainvoke(
+                        {
+                            "name": name,
+                            "args": args,
+                            "id": tool_call_id or f"call_{name}",
+                            "type": "tool_call",
+                        }
+                    )
+                    span.update(output=output.content)
+                    return output
+
+        outputs = await asyncio.gather(
+            *(
+                _run(name, inst, args, tool_call_id, span_name)
+                for name, inst, args, tool_call_id, span_name in calls
+            ),
+            return_exceptions=True,
+        )
+
+        # Append kết quả theo thứ tự ban đầu; call lỗi không làm mất kết quả của call khác
+        for (name, _, _, tool_call_id, _), output in zip(calls, outputs):
+            if isinstance(output, Exception):
+                logger.error(f"Tool {name} failed: {output}")
+                output = ToolMessage(
+                    content=f"Tool {name} failed: {output}",
+                    tool_call_id=tool_call_id or f"call_{name}",
+                )
+            elif isinstance(output, BaseException):
+                raise output
+            messages.append(output)
 
         return messages
 
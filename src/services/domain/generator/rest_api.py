@@ -1,7 +1,7 @@
 from langchain_core.messages import SystemMessage
 from src.cache.semantic_cache import semantic_cache_llms
 from src.utils.text_processing import build_context
-from .base import BaseGeneratorService
+from .base import BaseGeneratorService, rag_post_cache_key
 from langfuse import observe
 from src.utils import logger
 
@@ -68,7 +68,7 @@ class RestApiGeneratorService(BaseGeneratorService):
         return True, messages
 
     @observe(name="rag_generation_rest_api")
-    @semantic_cache_llms.cache(namespace="post-cache")
+    @semantic_cache_llms.cache(namespace="post-cache", key_builder=rag_post_cache_key)
     async def _rag_generation(
         self,
         messages: list,
@@ -1,4 +1,4 @@
-from .base import BaseGeneratorService
+from .base import BaseGeneratorService, rag_post_cache_key
 from src.utils import logger
 from src.utils.text_processing import build_context
 from langchain_core.messages import AIMessage, SystemMessage
@@ -103,7 +103,12 @@ class SSEGeneratorService(BaseGeneratorService):
             )
             yield True, messages
 
-    @semantic_cache_llms.cache(namespace="post-cache")
+    @semantic_cache_llms.cache(
+        namespace="post-cache",
+        key_builder=rag_post_cache_key,
+        # Yield text thô, get_sse_response mới frame thành SSE
+        stream_format="raw",
+    )
     async def _rag_generation(
         self,
         messages: list,
@@ -20,59 +20,38 @@ class SummarizeService:
         self.llm = ChatOpenAI(**SETTINGS.llm_config)
         self.langfuse_handler = langfuse_handler
 
-    async def _summarize_and_truncate_history(
+    async def summarize_incremental(
         self,
-        chat_history: list[dict],
-        keep_last: int = 4,
+        previous_summary: str | None,
+        new_messages: list[dict],
         session_id: str | None = None,
         user_id: str | None = None,
-    ) -> list[dict]:
-        """Summary 4 messages cũ nhất và giữ lại phần còn lại"""
-        if len(chat_history) <= keep_last:
-            return chat_history
-
-        try:
-            # Lấy keep_last messages cũ nhất để summary
-            old_messages = chat_history[:keep_last]
-            remaining_messages = chat_history[keep_last:]
-
-            # Tạo summary từ 6 messages cũ
-            old_conversation = "\n".join(
-                [
-                    f"{msg['role'].capitalize()}: {msg['content']}"
-                    for msg in old_messages
-                ]
-            )
-
+    ) -> str:
+        """Gộp các message mới vào summary đang có (rolling summary), không tóm tắt lại từ đầu"""
+        new_conversation = "\n".join(
+            [f"{msg['role'].capitalize()}: {msg['content']}" for msg in new_messages]
+        )
+
+        if previous_summary:
+            summary_prompt = f"""Update the conversation summary below with the new messages. Write it in English, keep key information and stay within 2-3 sentences.
+                Current summary: {previous_summary}
+                New messages:
+                {new_conversation}"""
+        else:
             summary_prompt = f"""Summarize this conversation in English, keeping key information (in 2-3 sentences):
-                {old_conversation}"""
-
-            # Call LLM để summary
-            summary_msg = await self.llm.ainvoke(
-                summary_prompt,
-                {
-                    "callbacks": [self.langfuse_handler],
-                    "metadata": {
-                        "langfuse_session_id": session_id,
-                        "langfuse_user_id": user_id,
-                    },
+                {new_conversation}"""
+
+        summary_msg = await self.llm.ainvoke(
+            summary_prompt,
+            {
+                "callbacks": [self.langfuse_handler],
+                "metadata": {
+                    "langfuse_session_id": session_id,
+                    "langfuse_user_id": user_id,
                 },
-            )
-
-            # Tạo history mới: summary + remaining messages
-            summarized_history = [
-                {
-                    "role": "system",
-                    "content": f"Previous conversation summary: {summary_msg.content}",
-                }
-            ] + remaining_messages
-
-            logger.info(
-                f"Summarized {len(old_messages)} old messages, kept {len(remaining_messages)} recent messages"
-            )
-            return summarized_history
-
-        except Exception as e:
-            logger.error(f"Error summarizing history: {e}")
-            # Fallback: chỉ lấy recent messages
-            return chat_history[-keep_last:]
+            },
+        )
+        logger.info(
+            f"Folded {len(new_messages)} messages into rolling summary for session {session_id}"
+        )
+        return summary_msg.content
@@ -0,0 +1,115 @@
+"""
+Gộp các RetrievalHit từ nhiều tool call thành context cho `prompt_rag`.
+
+Hit được duyệt theo thứ tự relevance (rank trong từng query, query gọi trước
+thắng khi hòa), loại chunk trùng id/trùng nội dung, cắt phần overlap giữa các
+chunk liền kề (do text splitter tạo ra) và dừng khi hết token budget.
+
+Dùng rank thay vì score vì score không so sánh được giữa các hit: dense trả về
+distance (nhỏ là tốt), hybrid trả về RRF score và rerank trả về cross-encoder
+score (lớn là tốt), rerank fallback còn giữ score của stage trước.
+
+So sánh trùng/overlap làm trên text đã gộp whitespace, nhưng output là text gốc
+của chunk (chỉ cắt phần overlap) để giữ xuống dòng, list và bảng.
+"""
+
+import re
+from typing import Callable, List, Tuple
+
+from src.config.settings import SETTINGS
+from src.schemas.domain.retrieval import RetrievalHit
+from src.utils.tokenizer import count_tokens
+
+_WORD_RE = re.compile(r"\S+")
+
+
+def _normalize(text: str) -> Tuple[str, List[int]]:
+    """
+    Gộp whitespace thành một dấu cách, kèm vị trí trong `text` của từng ký tự
+    sau khi gộp (để map phần cắt overlap về text gốc).
+    """
+    words: List[str] = []
+    offsets: List[int] = []
+    for match in _WORD_RE.finditer(text):
+        if words:
+            offsets.append(match.start() - 1)
+        words.append(match.group())
+        offsets.extend(range(match.start(), match.end()))
+    return " ".join(words), offsets
+
+
+def _overlap(left: str, right: str, min_chars: int) -> int:
+    """Độ dài phần cuối của `left` trùng với phần đầu của `right`"""
+    if len(left) < min_chars or len(right) < min_chars:
+        return 0
+    head = right[:min_chars]
+    start = left.find(head)
+    while start != -1:
+        tail = left[start:]
+        if right.startswith(tail):
+            return len(tail)
+        start = left.find(head, start + 1)
+    return 0
+
+
+def _trim_overlaps(text: str, selected: List[str], min_chars: int) -> Tuple[int, int]:
+    """Khoảng [start, end) của `text` còn lại sau khi bỏ phần đầu/cuối đã có sẵn"""
+    start, end = 0, len(text)
+    for other in selected:
+        if start >= end:
+            break
+        n = _overlap(other, text[start:end], min_chars)
+        if n:
+            start += n
+            while start < end and text[start] == " ":
+                start += 1
+        n = _overlap(text[start:end], other, min_chars)
+        if n:
+            end -= n
+            while end > start and text[end - 1] == " ":
+                end -= 1
+    return start, end
+
+
+def pack_hits(
+    hits: List[RetrievalHit],
+    max_tokens: int = SETTINGS.CONTEXT_MAX_TOKENS,
+    min_overlap_chars: int = SETTINGS.CONTEXT_MIN_OVERLAP_CHARS,
+    count_fn: Callable[[str], int] = count_tokens,
+) -> List[str]:
+    """
+    Chọn các đoạn text đưa vào context.
+
+    Returns:
+        List đoạn text theo thứ tự relevance, tổng số token <= max_tokens.
+    """
+    ordered = sorted(enumerate(hits), key=lambda item: (item[1].rank, item[0]))
+
+    seen_ids = set()
+    # selected: bản đã chuẩn hoá để so sánh, packed: text gốc để đưa vào prompt
+    selected: List[str] = []
+    packed: List[str] = []
+    used_tokens = 0
+    for _, hit in ordered:
+        if hit.id in seen_ids:
+            continue
+        seen_ids.add(hit.id)
+
+        normalized, offsets = _normalize(hit.text)
+        # Chunk nằm trọn trong chunk đã chọn (hoặc trùng hẳn) thì bỏ qua
+        if not normalized or any(normalized in other for other in selected):
+            continue
+        start, end = _trim_overlaps(normalized, selected, min_overlap_chars)
+        if start >= end:
+            continue
+        text = hit.text[offsets[start] : offsets[end - 1] + 1]
+
+        n_tokens = count_fn(text)
+        # Chunk không vừa thì thử chunk tiếp theo (có thể ngắn hơn)
+        if used_tokens + n_tokens > max_tokens:
+            continue
+        selected.append(normalized[start:end])
+        packed.append(text)
+        used_tokens += n_tokens
+
+    return packed
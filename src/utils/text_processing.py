@@ -1,12 +1,28 @@
 from typing import List
 from langchain_core.messages import BaseMessage, ToolMessage
-
-
-def build_context(messages: List[BaseMessage]) -> str:
+from src.config.settings import SETTINGS
+from src.schemas.domain.retrieval import RetrievalHit
+from src.utils.context_packer import pack_hits
+
+
+def build_context(
+    messages: List[BaseMessage], max_tokens: int = SETTINGS.CONTEXT_MAX_TOKENS
+) -> str:
+    """
+    Gộp kết quả tool thành context. ToolMessage có artifact (list RetrievalHit)
+    được dedupe và pack theo token budget; các ToolMessage khác giữ nguyên content.
+    """
     tool_chunks = []
+    hits: List[RetrievalHit] = []
     for m in messages:
         if isinstance(m, ToolMessage):
-            tool_chunks.append(str(m.content))
+            if m.artifact:
+                hits.extend(m.artifact)
+            else:
+                tool_chunks.append(str(m.content))
+
+    if hits:
+        tool_chunks.insert(0, "\n\n".join(pack_hits(hits, max_tokens=max_tokens)))
 
     context_str = "\n\n--- Retrieved Documents ---\n\n".join(tool_chunks)
     return context_str
@@ -0,0 +1,15 @@
+from functools import lru_cache
+
+from src.config.settings import SETTINGS
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(name: str = SETTINGS.CONTEXT_TOKENIZER_NAME):
+    """HF tokenizer load từ local cache, dùng để đếm token cho context budget"""
+    from transformers import AutoTokenizer
+
+    return AutoTokenizer.from_pretrained(name)
+
+
+def count_tokens(text: str) -> int:
+    return len(get_tokenizer().encode(text, add_special_tokens=False))